@@ -0,0 +1,298 @@
+import threading
+import uuid
+from collections import OrderedDict
+from time import monotonic
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .instrumentation import incr
+
+# Журнал инвалидаций в общем кеше: перезапись, incr или удаление
+# ключа увеличивают счётчик SEQ_KEY и кладут ключи под
+# LOG_KEY.format(номер). Процессы дочитывают журнал со своего номера
+# и выбрасывают из локального уровня только эти ключи.
+SEQ_KEY = 'two_tier:seq'
+LOG_KEY = 'two_tier:log:{}'
+
+_local_tiers = {}
+_local_tiers_lock = threading.Lock()
+
+
+class LocalTier:
+    """LRU с ограничением размера и временем жизни записей.
+
+    Один на процесс для каждого двухуровневого кеша: Django создаёт
+    объект бэкенда в каждом потоке, а локальный уровень общий.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        # свои записи журнала процесс пропускает
+        self.token = uuid.uuid4().hex
+        self.seq = None
+        self.missing = None
+        self.synced_at = None
+        self.stats = {
+            'local_hits': 0, 'shared_hits': 0, 'misses': 0,
+            'evictions': 0, 'invalidations': 0, 'resets': 0,
+        }
+
+    def get(self, key, sentinel):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return sentinel
+            value, expires = entry
+            if expires <= monotonic():
+                del self.entries[key]
+                return sentinel
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (value, monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def discard(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def count(self, stat, amount=1):
+        with self.lock:
+            self.stats[stat] += amount
+
+
+class TwoTierCache(BaseCache):
+    """Локальный LRU процесса перед общим кешем.
+
+    Чтение сначала ищет ключ в памяти процесса и только при промахе
+    идёт в общий кеш (OPTIONS['SHARED'] — имя другого кеша из CACHES).
+    Новый ключ просто добавляется в общий кеш: копий в других
+    процессах у него нет. Перезапись, incr и удаление ещё пишут ключ
+    в журнал инвалидаций; процессы читают журнал не чаще раза в
+    SYNC_INTERVAL секунд и выбрасывают только перечисленные ключи.
+    Если процесс отстал больше чем на LOG_MAX_READ записей или записи
+    журнала вытеснены, локальный уровень очищается целиком.
+
+    Локальная запись живёт не дольше LOCAL_TIMEOUT. Этим же сроком
+    ограничена копия ключа, который истёк или был вытеснен в общем
+    кеше и затем добавлен заново без записи в журнал.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options['SHARED']
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self.sync_interval = options.get('SYNC_INTERVAL', 1)
+        self.log_timeout = options.get('LOG_TIMEOUT', 300)
+        self.log_max_read = options.get('LOG_MAX_READ', 1000)
+        with _local_tiers_lock:
+            self.local = _local_tiers.setdefault(
+                location, LocalTier(options.get('LOCAL_MAX_ENTRIES', 1000))
+            )
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def local_ttl(self, timeout=DEFAULT_TIMEOUT):
+        """Срок локальной копии: не дольше LOCAL_TIMEOUT и timeout."""
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return self.local_timeout
+        return min(self.local_timeout, timeout)
+
+    def reset(self, seq):
+        """Очищает локальный уровень и продолжает журнал с номера seq."""
+        local = self.local
+        local.clear()
+        local.count('resets')
+        local.seq = seq
+        local.missing = None
+
+    def sync(self):
+        """Дочитывает журнал инвалидаций, если пора."""
+        local = self.local
+        now = monotonic()
+        if local.synced_at is not None and (
+            now - local.synced_at < self.sync_interval
+        ):
+            return
+        local.synced_at = now
+        seq = self.shared.get(SEQ_KEY) or 0
+        if local.seq is None:
+            # в локальном уровне ещё нет ничего, что журнал мог бы сбросить
+            local.seq = seq
+            return
+        if seq == local.seq:
+            return
+        if seq < local.seq or seq - local.seq > self.log_max_read:
+            # общий кеш очищен или процесс отстал слишком сильно
+            self.reset(seq)
+            return
+        numbers = range(local.seq + 1, seq + 1)
+        log = self.shared.get_many([LOG_KEY.format(n) for n in numbers])
+        for n in numbers:
+            entry = log.get(LOG_KEY.format(n))
+            if entry is None:
+                if local.missing == n:
+                    # записи нет и при повторном чтении — вытеснена
+                    self.reset(seq)
+                    return
+                # номер взят, но запись ещё не положена: дочитаем позже
+                local.missing = n
+                return
+            token, keys = entry
+            if token != local.token:
+                local.discard(*keys)
+                local.count('invalidations', len(keys))
+            local.seq = n
+        local.missing = None
+
+    def broadcast(self, *keys):
+        """Пишет в журнал ключи, копии которых в процессах устарели."""
+        shared = self.shared
+        shared.add(SEQ_KEY, 0, None)
+        try:
+            seq = shared.incr(SEQ_KEY)
+        except ValueError:
+            # счётчик вытеснили между add и incr: процессы, увидев
+            # номер меньше своего, очистят локальный уровень
+            shared.set(SEQ_KEY, 0, None)
+            return
+        shared.set(
+            LOG_KEY.format(seq), (self.local.token, keys), self.log_timeout
+        )
+
+    def get(self, key, default=None, version=None):
+        self.sync()
+        local_key = self.make_key(key, version)
+        sentinel = object()
+        value = self.local.get(local_key, sentinel)
+        if value is not sentinel:
+            self.local.count('local_hits')
+            incr('cache_hit')
+            incr('cache_local_hit')
+            return value
+        value = self.shared.get(key, sentinel, version)
+        if value is sentinel:
+            self.local.count('misses')
+            incr('cache_miss')
+            return default
+        self.local.count('shared_hits')
+        incr('cache_hit')
+        self.local.set(local_key, value, self.local_ttl())
+        return value
+
+    def get_many(self, keys, version=None):
+        self.sync()
+        sentinel = object()
+        found, missing = {}, []
+        for key in keys:
+            value = self.local.get(self.make_key(key, version), sentinel)
+            if value is sentinel:
+                missing.append(key)
+            else:
+                found[key] = value
+                self.local.count('local_hits')
+                incr('cache_hit')
+                incr('cache_local_hit')
+        if missing:
+            shared = self.shared.get_many(missing, version)
+            for key, value in shared.items():
+                self.local.set(
+                    self.make_key(key, version), value, self.local_ttl()
+                )
+            found.update(shared)
+            for key in missing:
+                if key in shared:
+                    self.local.count('shared_hits')
+                    incr('cache_hit')
+                else:
+                    self.local.count('misses')
+                    incr('cache_miss')
+        return found
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # ключа в общем кеше не было — копий в процессах тоже нет
+        # (или они истекут через LOCAL_TIMEOUT), журнал не нужен
+        self.sync()
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            self.local.set(
+                self.make_key(key, version), value, self.local_ttl(timeout)
+            )
+        return added
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.sync()
+        # промах и запись нового ключа — частый случай: одна операция
+        if not self.shared.add(key, value, timeout, version):
+            self.shared.set(key, value, timeout, version)
+            self.broadcast(self.make_key(key, version))
+        self.local.set(
+            self.make_key(key, version), value, self.local_ttl(timeout)
+        )
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self.sync()
+        failed = self.shared.set_many(data, timeout, version)
+        self.broadcast(*(self.make_key(key, version) for key in data))
+        for key, value in data.items():
+            if key not in failed:
+                self.local.set(
+                    self.make_key(key, version), value,
+                    self.local_ttl(timeout),
+                )
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self.shared.delete(key, version)
+        self.local.discard(self.make_key(key, version))
+        self.broadcast(self.make_key(key, version))
+
+    def delete_many(self, keys, version=None):
+        self.shared.delete_many(keys, version)
+        local_keys = [self.make_key(key, version) for key in keys]
+        self.local.discard(*local_keys)
+        self.broadcast(*local_keys)
+
+    def has_key(self, key, version=None):
+        return self.get(key, version=version) is not None
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version)
+        self.broadcast(self.make_key(key, version))
+        self.local.set(self.make_key(key, version), value, self.local_ttl())
+        return value
+
+    def decr(self, key, delta=1, version=None):
+        return self.incr(key, -delta, version)
+
+    def clear(self):
+        self.shared.clear()
+        self.reset(None)
+
+    def stats(self):
+        """Попадания, промахи и вытеснения локального уровня процесса."""
+        with self.local.lock:
+            return dict(self.local.stats, local_entries=len(
+                self.local.entries
+            ))
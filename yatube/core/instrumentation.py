@@ -0,0 +1,79 @@
+"""Сбор метрик запроса для PerformanceMiddleware.
+
+Метрики копятся в contextvar текущего запроса; вне запроса
+(и когда middleware выключен) record() и incr() ничего не делают.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+_metrics = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.counts = defaultdict(int)
+
+
+def start_request():
+    return _metrics.set(RequestMetrics())
+
+
+def finish_request(token):
+    metrics = _metrics.get()
+    _metrics.reset(token)
+    return metrics
+
+
+def record(name, seconds):
+    metrics = _metrics.get()
+    if metrics is not None:
+        metrics.durations[name] += seconds
+        metrics.counts[name] += 1
+
+
+def incr(name):
+    metrics = _metrics.get()
+    if metrics is not None:
+        metrics.counts[name] += 1
+
+
+@contextmanager
+def timed(name):
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        record(name, perf_counter() - start)
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    """execute_wrapper для подсчёта SQL-запросов и их времени."""
+    with timed('sql'):
+        return execute(sql, params, many, context)
+
+
+_templates_instrumented = False
+
+
+def instrument_templates():
+    """Оборачивает рендер шаблонов бэкенда Django замером времени.
+
+    Обёртка стоит на шаблоне верхнего уровня, поэтому include
+    внутри него не считаются второй раз.
+    """
+    global _templates_instrumented
+    if _templates_instrumented:
+        return
+    from django.template.backends.django import Template
+
+    render = Template.render
+
+    def timed_render(self, *args, **kwargs):
+        with timed('template'):
+            return render(self, *args, **kwargs)
+
+    Template.render = timed_render
+    _templates_instrumented = True
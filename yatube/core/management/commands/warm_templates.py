@@ -0,0 +1,34 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.template import engines
+
+from core.warmup import is_cached, warm_templates
+
+
+class Command(BaseCommand):
+    help = ('Разбирает все шаблоны и показывает время разбора каждого '
+            '(с кеширующим загрузчиком — заодно прогревает кеш).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20,
+                            help='Сколько самых медленных шаблонов вывести.')
+
+    def handle(self, *args, **options):
+        if not is_cached(engines['django'].engine):
+            self.stderr.write(
+                'Загрузчик шаблонов без кеша (TEMPLATE_CACHE выключен): '
+                'каждый запрос будет разбирать шаблоны заново.'
+            )
+        start = perf_counter()
+        timings = warm_templates()
+        total = perf_counter() - start
+        failed = [name for name, seconds in timings if seconds is None]
+        parsed = [item for item in timings if item[1] is not None]
+        for name, seconds in parsed[:options['top']]:
+            self.stdout.write(f'{seconds * 1000:8.2f} мс  {name}')
+        for name in failed:
+            self.stdout.write(f'{"ошибка":>11}  {name}')
+        self.stdout.write(
+            f'Итого шаблонов: {len(parsed)}, разбор {total * 1000:.2f} мс'
+        )
@@ -0,0 +1,76 @@
+import json
+import logging
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import instrumentation
+
+logger = logging.getLogger('yatube.performance')
+
+
+class PerformanceMiddleware:
+    """Отдаёт метрики запроса в заголовке Server-Timing.
+
+    SQL (число и время), рендер шаблонов, попадания и промахи кеша,
+    создание миниатюр. С PERFORMANCE_LOG пишет те же данные строкой
+    JSON в лог yatube.performance. Если PERFORMANCE_INSTRUMENTATION
+    выключен, middleware убирает себя из цепочки при старте.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        instrumentation.instrument_templates()
+
+    def __call__(self, request):
+        token = instrumentation.start_request()
+        start = perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(
+                        instrumentation.sql_wrapper
+                    ))
+                response = self.get_response(request)
+        finally:
+            metrics = instrumentation.finish_request(token)
+        total = perf_counter() - start
+        response['Server-Timing'] = self.server_timing(metrics, total)
+        if settings.PERFORMANCE_LOG:
+            logger.info(json.dumps(self.log_record(request, metrics, total)))
+        return response
+
+    @staticmethod
+    def server_timing(metrics, total):
+        durations, counts = metrics.durations, metrics.counts
+        return ', '.join((
+            f'sql;dur={durations["sql"] * 1000:.2f};'
+            f'desc="{counts["sql"]} queries"',
+            f'tpl;dur={durations["template"] * 1000:.2f}',
+            f'cache;desc="hit={counts["cache_hit"]} '
+            f'local={counts["cache_local_hit"]} '
+            f'miss={counts["cache_miss"]}"',
+            f'thumb;dur={durations["thumbnail"] * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ))
+
+    @staticmethod
+    def log_record(request, metrics, total):
+        match = request.resolver_match
+        return {
+            'view': match.view_name if match else None,
+            'path': request.path,
+            'total_ms': round(total * 1000, 2),
+            'sql_queries': metrics.counts['sql'],
+            'sql_ms': round(metrics.durations['sql'] * 1000, 2),
+            'template_ms': round(metrics.durations['template'] * 1000, 2),
+            'cache_hits': metrics.counts['cache_hit'],
+            'cache_local_hits': metrics.counts['cache_local_hit'],
+            'cache_misses': metrics.counts['cache_miss'],
+            'thumbnail_ms': round(metrics.durations['thumbnail'] * 1000, 2),
+        }
@@ -1,6 +1,20 @@
+import json
+import logging
 from http import HTTPStatus
+from io import StringIO
+from time import monotonic, perf_counter
+from unittest import mock
 
-from django.test import Client, TestCase
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.template import Context, Template
+from django.template.loader import get_template
+from django.test import Client, TestCase, override_settings
+
+from . import instrumentation
+from .cache import LOG_KEY, TwoTierCache, _local_tiers
+from .warmup import warm_on_start, warm_templates
 
 
 class CorePagesTests(TestCase):
@@ -10,3 +24,207 @@ class CorePagesTests(TestCase):
         response = self.user_client.get("/unknown_page/")
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, "core/404.html")
+
+
+class PerformanceMiddlewareTests(TestCase):
+    @override_settings(PERFORMANCE_INSTRUMENTATION=True, PERFORMANCE_LOG=True)
+    def test_server_timing_and_log(self):
+        """Ответ несёт Server-Timing, в лог уходит строка JSON."""
+        cache.clear()
+        with self.assertLogs('yatube.performance') as logs:
+            response = Client().get('/')
+        self.assertIn('sql;dur=', response['Server-Timing'])
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertGreater(record['sql_queries'], 0)
+        self.assertGreater(record['cache_misses'], 0)
+
+    def test_log_is_configured(self):
+        """Строки INFO из yatube.performance доходят до обработчика."""
+        logger = logging.getLogger('yatube.performance')
+        self.assertTrue(logger.isEnabledFor(logging.INFO))
+        self.assertTrue(logger.handlers)
+
+    @override_settings(PERFORMANCE_INSTRUMENTATION=False)
+    def test_disabled(self):
+        response = Client().get('/')
+        self.assertNotIn('Server-Timing', response)
+
+
+@override_settings(CACHES={
+    # общий уровень — отдельный LocMemCache вместо memcached/redis
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'two-tier-tests',
+    },
+    'template_fragments': {
+        'BACKEND': 'core.cache.TwoTierCache',
+        'LOCATION': 'fragments',
+        'OPTIONS': {'SHARED': 'shared'},
+    },
+})
+class TwoTierCacheTests(TestCase):
+    def make_cache(self, location, **options):
+        """Кеш «процесса» location поверх общего уровня."""
+        options = {'SHARED': 'shared', 'SYNC_INTERVAL': 0, **options}
+        _local_tiers.pop(location, None)
+        self.addCleanup(_local_tiers.pop, location, None)
+        return TwoTierCache(location, {'OPTIONS': options})
+
+    def setUp(self):
+        self.shared = caches['shared']
+        self.shared.clear()
+
+    def test_local_hit_skips_shared_tier(self):
+        """Повторное чтение не обращается к общему кешу."""
+        two_tier = self.make_cache('first', SYNC_INTERVAL=60)
+        two_tier.set('key', 'value')
+        with mock.patch.object(
+            self.shared, 'get', side_effect=AssertionError
+        ):
+            self.assertEqual(two_tier.get('key'), 'value')
+        self.assertEqual(two_tier.stats()['local_hits'], 1)
+
+    def test_write_invalidates_other_processes(self):
+        """Запись в одном процессе сбрасывает копии в другом."""
+        first = self.make_cache('first')
+        second = self.make_cache('second')
+        first.set('key', 'old')
+        self.assertEqual(second.get('key'), 'old')
+        first.set('key', 'new')
+        self.assertEqual(second.get('key'), 'new')
+        first.delete('key')
+        self.assertIsNone(second.get('key'))
+        self.assertGreaterEqual(second.stats()['invalidations'], 2)
+
+    def test_new_key_keeps_other_local_copies(self):
+        """Запись нового ключа не сбрасывает чужие локальные копии."""
+        first = self.make_cache('first')
+        second = self.make_cache('second')
+        second.set('hot', 'value')
+        self.assertEqual(second.get('hot'), 'value')
+        first.set('unrelated', 1)
+        first.set('unrelated', 2)
+        self.assertEqual(second.get('hot'), 'value')
+        stats = second.stats()
+        self.assertEqual(stats['local_hits'], 2)
+        self.assertEqual(stats['shared_hits'], 0)
+        # из журнала выброшен только перезаписанный ключ
+        self.assertEqual(stats['invalidations'], 1)
+        self.assertEqual(stats['resets'], 0)
+
+    def test_lost_log_resets_local_tier(self):
+        first = self.make_cache('first')
+        second = self.make_cache('second')
+        second.get('warm-up')
+        first.set('key', 1)
+        first.set('key', 2)
+        # запись журнала вытеснена из общего кеша
+        self.shared.delete(LOG_KEY.format(1))
+        second.get('key')
+        second.get('key')
+        self.assertEqual(second.stats()['resets'], 1)
+
+    def test_get_many_records_metrics(self):
+        two_tier = self.make_cache('first')
+        two_tier.set('a', 1)
+        self.shared.set('b', 2)
+        token = instrumentation.start_request()
+        two_tier.get_many(['a', 'b', 'c'])
+        counts = instrumentation.finish_request(token).counts
+        self.assertEqual(counts['cache_hit'], 2)
+        self.assertEqual(counts['cache_local_hit'], 1)
+        self.assertEqual(counts['cache_miss'], 1)
+
+    def test_incr_is_shared(self):
+        first = self.make_cache('first')
+        second = self.make_cache('second')
+        first.set('version', 1)
+        self.assertEqual(second.get('version'), 1)
+        second.incr('version')
+        self.assertEqual(first.get('version'), 2)
+
+    def test_lru_eviction(self):
+        """Локальный уровень ограничен и вытесняет давние записи."""
+        two_tier = self.make_cache('first', LOCAL_MAX_ENTRIES=2)
+        for key in ('a', 'b', 'c'):
+            two_tier.set(key, key)
+        stats = two_tier.stats()
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['local_entries'], 2)
+        self.assertEqual(two_tier.get('a'), 'a')
+        self.assertEqual(two_tier.stats()['shared_hits'], 1)
+
+    def test_local_copy_expires(self):
+        """Локальная копия живёт не дольше LOCAL_TIMEOUT."""
+        two_tier = self.make_cache(
+            'first', LOCAL_TIMEOUT=5, SYNC_INTERVAL=60
+        )
+        two_tier.set('key', 'old')
+        # запись мимо двухуровневого кеша: рассылки не было
+        self.shared.set('key', 'new')
+        self.assertEqual(two_tier.get('key'), 'old')
+        with mock.patch('core.cache.monotonic', return_value=monotonic() + 6):
+            self.assertEqual(two_tier.get('key'), 'new')
+
+    def test_fragment_cache(self):
+        """Подходит для {% cache %}: фрагмент берётся из памяти процесса."""
+        _local_tiers.pop('fragments', None)
+        template = Template(
+            '{% load cache %}{% cache 60 fragment %}{{ value }}'
+            '{% endcache %}'
+        )
+        self.assertEqual(template.render(Context({'value': 1})), '1')
+        self.assertEqual(template.render(Context({'value': 2})), '1')
+        self.assertEqual(
+            caches['template_fragments'].stats()['local_hits'], 1
+        )
+
+
+@override_settings(TEMPLATE_WARMUP=True, TEMPLATES=[{
+    **settings.TEMPLATES[0],
+    'OPTIONS': {
+        **settings.TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('django.template.loaders.cached.Loader',
+             settings.TEMPLATE_LOADERS),
+        ],
+    },
+}])
+class WarmTemplatesTests(TestCase):
+    def test_warm_templates_fills_cache(self):
+        """После прогрева шаблоны и include не читаются с диска."""
+        timings = dict(warm_templates())
+        self.assertIn('posts/index.html', timings)
+        self.assertIn('posts/includes/post_item.html', timings)
+        with mock.patch(
+            'django.template.loaders.filesystem.Loader.get_contents',
+            side_effect=AssertionError,
+        ):
+            get_template('posts/includes/paginator.html')
+            Client().get('/')
+
+    def test_command_report(self):
+        output = StringIO()
+        call_command('warm_templates', top=3, stdout=output)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertIn('Итого шаблонов:', lines[-1])
+
+    def test_boot_log(self):
+        with self.assertLogs('yatube.performance') as logs:
+            warm_on_start(perf_counter())
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['event'], 'boot')
+        self.assertGreater(record['templates'], 0)
+
+    def test_boot_report_without_logging(self):
+        """Без настроенного лога отчёт о старте уходит в stderr."""
+        logger = logging.getLogger('yatube.performance')
+        self.addCleanup(logger.setLevel, logger.level)
+        logger.setLevel(logging.WARNING)
+        with mock.patch('sys.stderr', new_callable=StringIO) as stderr:
+            warm_on_start(perf_counter())
+        self.assertEqual(json.loads(stderr.getvalue())['event'], 'boot')
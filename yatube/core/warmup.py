@@ -0,0 +1,98 @@
+"""Разбор всех шаблонов при старте процесса.
+
+С кеширующим загрузчиком (settings.TEMPLATE_CACHE) разобранный шаблон
+живёт в памяти процесса до его перезапуска. warm_templates() заранее
+загружает каждый файл из каталогов шаблонов, и первый запрос к
+холодному процессу не платит за разбор. Команда warm_templates
+показывает время разбора по шаблонам, yatube/wsgi.py — ещё и время
+старта процесса.
+"""
+import json
+import logging
+import os
+import sys
+from time import perf_counter
+
+from django.conf import settings
+from django.template import TemplateSyntaxError, engines
+from django.template.loaders.cached import Loader as CachedLoader
+
+logger = logging.getLogger('yatube.performance')
+
+
+def _loaders(engine):
+    for loader in engine.template_loaders:
+        if isinstance(loader, CachedLoader):
+            yield from loader.loaders
+        else:
+            yield loader
+
+
+def is_cached(engine):
+    return any(
+        isinstance(loader, CachedLoader) for loader in engine.template_loaders
+    )
+
+
+def template_names(engine):
+    """Имена всех шаблонов из каталогов загрузчиков движка."""
+    names = set()
+    for loader in _loaders(engine):
+        for directory in loader.get_dirs():
+            for root, _, files in os.walk(directory):
+                for filename in files:
+                    if filename.startswith('.'):
+                        continue
+                    path = os.path.join(root, filename)
+                    names.add(os.path.relpath(path, directory).replace(
+                        os.sep, '/'
+                    ))
+    return sorted(names)
+
+
+def warm_templates(alias='django'):
+    """Загружает все шаблоны движка и возвращает время разбора каждого.
+
+    Список пар (имя, секунды) от самого медленного. Шаблоны, которые
+    не разбираются (например, из приложений не из INSTALLED_APPS),
+    пропускаются со временем None.
+    """
+    engine = engines[alias].engine
+    timings = []
+    for name in template_names(engine):
+        start = perf_counter()
+        try:
+            engine.get_template(name)
+        except (TemplateSyntaxError, UnicodeDecodeError):
+            timings.append((name, None))
+            continue
+        timings.append((name, perf_counter() - start))
+    return sorted(timings, key=lambda item: -(item[1] or 0))
+
+
+def warm_on_start(started):
+    """Прогревает шаблоны и пишет в лог, сколько занял старт процесса.
+
+    started — perf_counter() до django.setup(); зовётся из wsgi.py.
+    Если yatube.performance не пишет INFO (LOGGING переопределён без
+    него), отчёт выводится в stderr.
+    """
+    boot = perf_counter() - started
+    timings = warm_templates() if settings.TEMPLATE_WARMUP else []
+    parsed = [(name, seconds) for name, seconds in timings if seconds]
+    report = json.dumps({
+        'event': 'boot',
+        'boot_ms': round(boot * 1000, 2),
+        'templates': len(parsed),
+        'template_parse_ms': round(
+            sum(seconds for _, seconds in parsed) * 1000, 2
+        ),
+        'slowest': [
+            [name, round(seconds * 1000, 2)] for name, seconds in parsed[:5]
+        ],
+        'total_ms': round((perf_counter() - started) * 1000, 2),
+    })
+    if logger.isEnabledFor(logging.INFO) and logger.hasHandlers():
+        logger.info(report)
+    else:
+        print(report, file=sys.stderr)
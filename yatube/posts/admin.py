@@ -1,6 +1,17 @@
 from django.contrib import admin
 
-from .models import Group, Post
+from .export import export_response
+from .models import Comment, Follow, Group, Post
+from .search import matching_ids
+
+
+def export_action(kind, fmt):
+    """Действие админки: потоковая выгрузка выбранных записей."""
+    def action(modeladmin, request, queryset):
+        return export_response(kind, fmt, queryset=queryset)
+    action.short_description = f'Выгрузить выбранные в {fmt.upper()}'
+    action.__name__ = f'export_{fmt}'
+    return action
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -9,6 +20,13 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     list_filter = ('pub_date', 'group',)
     empty_value_display = '-пусто-'
+    actions = (export_action('posts', 'jsonl'), export_action('posts', 'csv'))
+
+    def get_search_results(self, request, queryset, search_term):
+        # вместо LIKE '%...%' по всей таблице — индекс FTS5
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(pk__in=matching_ids(search_term)), False
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -17,5 +35,26 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
+class CommentAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'text', 'created', 'author', 'post',)
+    list_select_related = ('author', 'post',)
+    raw_id_fields = ('post', 'author',)
+    empty_value_display = '-пусто-'
+    actions = (
+        export_action('comments', 'jsonl'), export_action('comments', 'csv')
+    )
+
+
+class FollowAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'user', 'author',)
+    list_select_related = ('user', 'author',)
+    raw_id_fields = ('user', 'author',)
+    actions = (
+        export_action('follows', 'jsonl'), export_action('follows', 'csv')
+    )
+
+
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
+admin.site.register(Comment, CommentAdmin)
+admin.site.register(Follow, FollowAdmin)
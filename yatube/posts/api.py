@@ -0,0 +1,125 @@
+"""JSON-версии лент и страницы поста для мобильных клиентов.
+
+Запросы те же, что у HTML-страниц, но строки берутся через values()
+только с нужными полями, а авторы и группы приходят один раз
+на ответ в словарях authors/groups.
+"""
+from http import HTTPStatus
+
+from django.conf import settings
+from django.db.models import F
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
+
+from yatube.constants import POSTS_PER_STR
+
+from .lookups import get_author_or_404, get_group_or_404
+from .models import Comment, Group, Post, User
+from .utils import comment_page_object, cursor_page_object
+
+POST_FIELDS = ('pk', 'text', 'pub_date', 'author_id', 'group_id', 'image',
+               'comment_count')
+AUTHOR_FIELDS = ('pk', 'username', 'first_name', 'last_name')
+GROUP_FIELDS = ('pk', 'title', 'slug')
+COMMENT_FIELDS = ('pk', 'text', 'created', 'author_id')
+
+
+def _serialize_post(row):
+    return {
+        'id': row['pk'],
+        'text': row['text'],
+        'pub_date': row['pub_date'],
+        'author': row['author_id'],
+        'group': row['group_id'],
+        'image': settings.MEDIA_URL + row['image'] if row['image'] else None,
+        'comments': row['comment_count'],
+    }
+
+
+def _embedded(model, ids, fields):
+    """Связанные записи одним запросом: {id: {поля}}."""
+    ids = {pk for pk in ids if pk is not None}
+    if not ids:
+        return {}
+    return {
+        row.pop('pk'): row
+        for row in model.objects.filter(pk__in=ids).values(*fields)
+    }
+
+
+def _feed_response(request, rows, keys=('pub_date', 'pk')):
+    page = cursor_page_object(request, rows, POSTS_PER_STR, keys)
+    posts = [_serialize_post(row) for row in page]
+    return JsonResponse({
+        'posts': posts,
+        'authors': _embedded(
+            User, (post['author'] for post in posts), AUTHOR_FIELDS),
+        'groups': _embedded(
+            Group, (post['group'] for post in posts), GROUP_FIELDS),
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+@require_GET
+def index(request):
+    return _feed_response(request, Post.objects.values(*POST_FIELDS))
+
+
+@require_GET
+def group_posts(request, slug):
+    group = get_group_or_404(slug)
+    return _feed_response(
+        request, group.group_posts.values(*POST_FIELDS))
+
+
+@require_GET
+def profile(request, username):
+    author = get_author_or_404(username)
+    return _feed_response(request, author.posts.values(*POST_FIELDS))
+
+
+@require_GET
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return JsonResponse(
+            {'detail': 'Нужна авторизация.'}, status=HTTPStatus.UNAUTHORIZED
+        )
+    rows = request.user.feed_items.values(
+        'pub_date', 'post_id',
+        pk=F('post_id'), text=F('post__text'),
+        author_id=F('post__author_id'), group_id=F('post__group_id'),
+        image=F('post__image'), comment_count=F('post__comment_count'),
+    )
+    return _feed_response(request, rows, keys=('pub_date', 'post_id'))
+
+
+@require_GET
+def post_detail(request, post_id):
+    post = get_object_or_404(Post.objects.values(*POST_FIELDS), pk=post_id)
+    page = comment_page_object(
+        request,
+        Comment.objects.filter(post_id=post_id).values(*COMMENT_FIELDS),
+    )
+    comments = [
+        {
+            'id': row['pk'],
+            'text': row['text'],
+            'created': row['created'],
+            'author': row['author_id'],
+        }
+        for row in page
+    ]
+    return JsonResponse({
+        'post': _serialize_post(post),
+        'comments': comments,
+        'authors': _embedded(
+            User,
+            [post['author_id']] + [row['author'] for row in comments],
+            AUTHOR_FIELDS,
+        ),
+        'groups': _embedded(Group, [post['group_id']], GROUP_FIELDS),
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
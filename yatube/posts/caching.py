@@ -0,0 +1,96 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from yatube.constants import FEED_CACHE_TIMEOUT
+
+FEED_VERSION_KEY = 'feed_version:{}'
+FEED_MODIFIED_KEY = 'feed_modified:{}'
+# Поля поста, которые видны в лентах: сохранение с update_fields
+# без них версии лент не меняет.
+POST_FEED_FIELDS = frozenset((
+    'text', 'text_html', 'excerpt_html', 'group', 'image', 'author',
+    'pub_date',
+))
+
+
+def get_feed_version(feed):
+    version = cache.get(FEED_VERSION_KEY.format(feed))
+    if version is None:
+        version = time.time_ns()
+        cache.add(FEED_VERSION_KEY.format(feed), version, None)
+    return version
+
+
+def get_feed_modified(feed):
+    """Время последней записи, затронувшей ленту (для Last-Modified)."""
+    modified = cache.get(FEED_MODIFIED_KEY.format(feed))
+    if modified is None:
+        modified = timezone.now()
+        cache.add(FEED_MODIFIED_KEY.format(feed), modified, None)
+    return modified
+
+
+class PendingBump:
+    """on_commit-колбэк: одна смена версии каждой ленты на транзакцию."""
+
+    def __init__(self):
+        self.feeds = set()
+
+    def __call__(self):
+        _bump(self.feeds)
+
+
+def bump_feed_versions(*feeds):
+    """Сбрасывает закешированные фрагменты лент новой версией.
+
+    Внутри транзакции версии меняются один раз, после коммита: каскадное
+    удаление сотен строк даёт одну запись в кеш на ленту, а не сотни.
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        _bump(feeds)
+        return
+    savepoints = set(connection.savepoint_ids)
+    for sids, callback in connection.run_on_commit:
+        # колбэк из той же точки сохранения: её откат снимет оба сразу
+        if isinstance(callback, PendingBump) and sids == savepoints:
+            callback.feeds.update(feeds)
+            return
+    pending = PendingBump()
+    pending.feeds.update(feeds)
+    transaction.on_commit(pending)
+
+
+def _bump(feeds):
+    now = timezone.now()
+    for feed in feeds:
+        cache.set(FEED_MODIFIED_KEY.format(feed), now, None)
+        try:
+            cache.incr(FEED_VERSION_KEY.format(feed))
+        except ValueError:
+            # Версию вытеснили из кеша: начинаем с отметки времени,
+            # чтобы не совпасть ни с одной из прежних версий.
+            cache.set(FEED_VERSION_KEY.format(feed), time.time_ns(), None)
+
+
+def feed_cache_context(request, feed, viewer):
+    """Контекст для {% cache feed_cache_timeout feed_page feed_cache_key %}.
+
+    Ключ фрагмента: лента, класс зрителя, версия ленты и параметры
+    страницы (?page=, ?after=, ?before=).
+    """
+    return {
+        'feed_cache_timeout': FEED_CACHE_TIMEOUT,
+        'feed_cache_key': ':'.join((
+            feed, str(viewer), str(get_feed_version(feed)),
+            request.GET.urlencode(),
+        )),
+    }
+
+
+def feed_count_key(feed, ident):
+    """Ключ числа постов ленты ident, сбрасываемый версией feed."""
+    return f'feed_count:{ident}:{get_feed_version(feed)}'
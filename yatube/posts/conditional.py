@@ -0,0 +1,81 @@
+"""Валидаторы ETag/Last-Modified для условных GET-запросов.
+
+Их считают до вызова view, поэтому при совпадении ответ 304
+отдаётся без page_obj и без рендера шаблона.
+"""
+import hashlib
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+from django.views.decorators.http import condition
+
+from .caching import get_feed_modified, get_feed_version
+from .models import Comment, Post
+
+
+def viewer_tag(request):
+    """Часть ETag, зависящая от зрителя.
+
+    Страница содержит имя пользователя и CSRF-токен, поэтому
+    ответ одного зрителя не должен подойти другому.
+    """
+    user = request.user.pk if request.user.is_authenticated else 'anon'
+    csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    return f'{user}:{csrf}'
+
+
+def make_etag(*parts):
+    raw = ':'.join(str(part) for part in parts)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def feed_condition(*feeds):
+    """condition() по версиям и времени изменения лент из posts.caching."""
+
+    def etag(request, *args, **kwargs):
+        return make_etag(
+            *(get_feed_version(feed) for feed in feeds), viewer_tag(request)
+        )
+
+    def last_modified(request, *args, **kwargs):
+        return max(get_feed_modified(feed) for feed in feeds)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def _post_state(request, post_id):
+    """Время правки поста, последнего комментария, число комментариев,
+    число постов автора и его имя.
+
+    Один запрос на оба валидатора: результат запоминается в request.
+    """
+    if not hasattr(request, '_post_state'):
+        last_comment = Comment.objects.filter(
+            post=OuterRef('pk')
+        ).order_by('-created').values('created')[:1]
+        request._post_state = Post.objects.filter(pk=post_id).annotate(
+            last_comment=Subquery(last_comment)
+        ).order_by().values_list(
+            'updated', 'last_comment', 'comment_count',
+            'author__post_counter__posts_count', 'author__username',
+            'author__first_name', 'author__last_name',
+        ).first()
+    return request._post_state
+
+
+def _post_etag(request, post_id):
+    state = _post_state(request, post_id)
+    return make_etag(*state, viewer_tag(request)) if state else None
+
+
+def _post_last_modified(request, post_id):
+    state = _post_state(request, post_id)
+    if state is None:
+        return None
+    updated, last_comment = state[:2]
+    return max(updated, last_comment or updated)
+
+
+post_condition = condition(
+    etag_func=_post_etag, last_modified_func=_post_last_modified
+)
@@ -0,0 +1,13 @@
+from django.utils.functional import SimpleLazyObject
+
+from .follows import following_ids
+
+
+def following(request):
+    """Подписки читателя для шаблонов: {% if author.pk in following_ids %}.
+
+    Запрос к базе или кешу — только если шаблон к ним обратился.
+    """
+    return {
+        'following_ids': SimpleLazyObject(lambda: following_ids(request)),
+    }
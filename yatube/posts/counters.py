@@ -0,0 +1,112 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .images import delete_image
+from .models import Comment, Post, PostCounter, StoredImage
+
+
+def recount_posts(author_id):
+    """Пересчитывает число постов автора по таблице постов."""
+    PostCounter.objects.update_or_create(
+        author_id=author_id,
+        defaults={
+            'posts_count': Post.objects.filter(author_id=author_id).count()
+        },
+    )
+
+
+def increment_posts_count(author_id):
+    with transaction.atomic():
+        updated = PostCounter.objects.filter(author_id=author_id).update(
+            posts_count=F('posts_count') + 1
+        )
+        if not updated:
+            recount_posts(author_id)
+
+
+def decrement_posts_count(author_id):
+    # Строку счётчика не создаём: при каскадном удалении автора
+    # она удаляется вместе с ним.
+    PostCounter.objects.filter(
+        author_id=author_id, posts_count__gt=0
+    ).update(posts_count=F('posts_count') - 1)
+
+
+def get_posts_count(author):
+    counter = getattr(author, 'post_counter', None)
+    return counter.posts_count if counter else 0
+
+
+def increment_comment_count(post_id):
+    # UPDATE ... SET comment_count = comment_count + 1 — без гонок
+    # между параллельными комментариями
+    Post.objects.filter(pk=post_id).update(
+        comment_count=F('comment_count') + 1
+    )
+
+
+def decrement_comment_count(post_id):
+    # при каскадном удалении поста строки уже может не быть — не страшно
+    Post.objects.filter(pk=post_id, comment_count__gt=0).update(
+        comment_count=F('comment_count') - 1
+    )
+
+
+def comment_count_mismatches():
+    """Пары (id поста, настоящее число комментариев) для расхождений."""
+    actual = Comment.objects.filter(
+        post=OuterRef('pk')
+    ).order_by().values('post').annotate(total=Count('pk')).values('total')
+    return Post.objects.annotate(
+        actual=Coalesce(Subquery(actual), 0)
+    ).exclude(comment_count=F('actual')).values_list('pk', 'actual')
+
+
+def recount_image(name):
+    """Пересчитывает ссылки на файл картинки по таблице постов."""
+    StoredImage.objects.update_or_create(
+        name=name,
+        defaults={'ref_count': Post.objects.filter(image=name).count()},
+    )
+
+
+def acquire_image(name):
+    with transaction.atomic():
+        updated = StoredImage.objects.filter(name=name).update(
+            ref_count=F('ref_count') + 1
+        )
+        if not updated:
+            recount_image(name)
+
+
+def release_image(name):
+    """Снимает ссылку на файл; последняя удаляет его после коммита."""
+    StoredImage.objects.filter(name=name, ref_count__gt=0).update(
+        ref_count=F('ref_count') - 1
+    )
+    # условие в самом DELETE: параллельная ссылка строку сохранит
+    deleted, _ = StoredImage.objects.filter(name=name, ref_count=0).delete()
+    if deleted:
+        transaction.on_commit(lambda: delete_unreferenced_image(name))
+
+
+def delete_unreferenced_image(name):
+    # до коммита ту же картинку могли загрузить снова
+    if not StoredImage.objects.filter(name=name).exists():
+        delete_image(name)
+
+
+def image_ref_mismatches():
+    """Пары (файл, настоящее число ссылок) для расхождений."""
+    actual = dict(
+        Post.objects.exclude(image='').order_by().values(
+            'image'
+        ).annotate(total=Count('pk')).values_list('image', 'total')
+    )
+    stored = dict(StoredImage.objects.values_list('name', 'ref_count'))
+    return [
+        (name, actual.get(name, 0))
+        for name in actual.keys() | stored.keys()
+        if actual.get(name, 0) != stored.get(name)
+    ]
@@ -0,0 +1,36 @@
+from .models import FeedItem, Follow, Post
+
+BATCH_SIZE = 1000
+
+
+def push_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    FeedItem.objects.bulk_create(
+        (FeedItem(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fill_feed(user_id, author_id):
+    """Добавляет в ленту читателя все посты автора."""
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')
+    FeedItem.objects.bulk_create(
+        (FeedItem(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in posts.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def drop_feed(user_id, author_id):
+    """Убирает посты автора из ленты читателя."""
+    FeedItem.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
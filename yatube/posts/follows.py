@@ -0,0 +1,45 @@
+"""Множество авторов, на которых подписан читатель.
+
+Все id подписок читателя достаются одним запросом и лежат в кеше
+до ближайшей подписки или отписки (см. posts/signals.py), а на время
+запроса запоминаются в request: проверка «подписан ли» для любого
+числа авторов на странице — поиск во frozenset.
+"""
+from django.core.cache import cache
+
+from yatube.constants import FEED_CACHE_TIMEOUT
+
+from .models import Follow
+
+FOLLOWING_KEY = 'following:{}'
+
+
+def get_following_ids(user_id):
+    key = FOLLOWING_KEY.format(user_id)
+    following = cache.get(key)
+    if following is None:
+        following = frozenset(
+            Follow.objects.filter(user_id=user_id).values_list(
+                'author_id', flat=True
+            )
+        )
+        cache.set(key, following, FEED_CACHE_TIMEOUT)
+    return following
+
+
+def forget_following(*user_ids):
+    cache.delete_many([FOLLOWING_KEY.format(pk) for pk in user_ids])
+
+
+def following_ids(request):
+    """id авторов, на которых подписан текущий пользователь."""
+    if not hasattr(request, '_following_ids'):
+        request._following_ids = (
+            get_following_ids(request.user.pk)
+            if request.user.is_authenticated else frozenset()
+        )
+    return request._following_ids
+
+
+def is_following(request, author):
+    return author.pk in following_ids(request)
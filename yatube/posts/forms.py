@@ -1,12 +1,26 @@
 from django import forms
 
+from .images import ingest_image
 from .models import Post, Comment
 
 
+class IngestedImageField(forms.ImageField):
+    """Картинка, перекодированная через posts.images.ingest_image."""
+
+    def to_python(self, data):
+        upload = forms.FileField.to_python(self, data)
+        if upload is None:
+            return None
+        return ingest_image(upload)
+
+
 class PostForm(forms.ModelForm):
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
+        field_classes = {
+            'image': IngestedImageField,
+        }
 
         labels = {
             'text': ('Текст поста'),
@@ -17,6 +31,14 @@ class PostForm(forms.ModelForm):
             'group': 'Группа, к которой будет относиться пост',
         }
 
+    def save(self, commit=True):
+        if 'image' in self.changed_data:
+            # у очищенной картинки размеров нет
+            self.instance.image_width, self.instance.image_height = getattr(
+                self.cleaned_data['image'], 'image_size', (None, None)
+            )
+        return super().save(commit)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,138 @@
+"""Приём картинок постов и варианты разной ширины для srcset.
+
+Загрузка читается обработчиком posts.uploads.LimitedUploadHandler
+не дальше IMAGE_MAX_UPLOAD_SIZE. Затем ingest_image() проверяет число
+пикселей ещё до декодирования, поворачивает снимок по EXIF и
+перекодирует его в JPEG (WebP, если есть прозрачность) со стороной
+не больше IMAGE_MAX_SIDE. Метаданные в новый файл не попадают.
+Варианты для srcset лежат рядом, в variants/, под именами, которые
+выводятся из имени картинки, так что шаблону не нужен storage.
+Файлы не перезаписываются (см. posts/storage.py), поэтому готовые
+варианты заново не делаются.
+"""
+import os
+from io import BytesIO
+
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+from sorl.thumbnail import delete as delete_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+from yatube.constants import (IMAGE_MAX_PIXELS, IMAGE_MAX_SIDE,
+                              IMAGE_MAX_UPLOAD_SIZE, IMAGE_QUALITY,
+                              IMAGE_VARIANT_WIDTHS)
+
+from .storage import image_storage
+
+FORMATS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def _encode(image, image_format):
+    buffer = BytesIO()
+    if image_format == 'JPEG':
+        image.save(buffer, 'JPEG', quality=IMAGE_QUALITY, optimize=True,
+                   progressive=True)
+    else:
+        image.save(buffer, image_format, quality=IMAGE_QUALITY)
+    return buffer.getvalue()
+
+
+def ingest_image(upload):
+    """Проверяет загруженную картинку и возвращает перекодированный файл."""
+    if upload.size > IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)s.',
+            params={'limit': filesizeformat(IMAGE_MAX_UPLOAD_SIZE)},
+            code='file_too_large',
+        )
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+        width, height = image.size
+        if width * height > IMAGE_MAX_PIXELS:
+            raise ValidationError(
+                'Слишком большое изображение: %(width)d×%(height)d.',
+                params={'width': width, 'height': height},
+                code='too_many_pixels',
+            )
+        # JPEG декодируется сразу в уменьшенном масштабе
+        image.draft('RGB', (IMAGE_MAX_SIDE, IMAGE_MAX_SIDE))
+        image = ImageOps.exif_transpose(image)
+        alpha = _has_alpha(image)
+        image = image.convert('RGBA' if alpha else 'RGB')
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError(
+            'Не удалось прочитать изображение.', code='invalid_image'
+        )
+    image.thumbnail((IMAGE_MAX_SIDE, IMAGE_MAX_SIDE), Image.LANCZOS)
+    image_format = 'WEBP' if alpha else 'JPEG'
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    content = ContentFile(
+        _encode(image, image_format),
+        name=f'{stem}.{FORMATS[image_format]}',
+    )
+    content.image_size = image.size
+    return content
+
+
+def variant_name(name, width):
+    """Имя варианта картинки name шириной width."""
+    folder, filename = os.path.split(name)
+    stem, ext = os.path.splitext(filename)
+    return f'{folder}/variants/{stem}_{width}w{ext}'
+
+
+def variant_widths(width):
+    """Ширины вариантов, которые есть у картинки шириной width."""
+    return [size for size in IMAGE_VARIANT_WIDTHS if size < width]
+
+
+def save_variants(name, size=None):
+    """Сохраняет недостающие варианты картинки name, возвращает её размеры.
+
+    size — размеры картинки, если они уже известны: тогда при готовых
+    вариантах файл даже не открывается.
+    """
+    if size is None:
+        with image_storage.open(name) as source:
+            # open() читает только заголовок, без декодирования
+            size = Image.open(source).size
+    missing = [
+        width for width in variant_widths(size[0])
+        if not image_storage.exists(variant_name(name, width))
+    ]
+    if not missing:
+        return size
+    with image_storage.open(name) as source:
+        image = Image.open(source)
+        image.load()
+    image_format = image.format if image.format in FORMATS else 'JPEG'
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    # от меньшего к большему: по самому широкому шаблон узнаёт,
+    # что готовы все варианты
+    for width in missing:
+        variant = image.resize(
+            (width, round(image.height * width / image.width)),
+            Image.LANCZOS,
+        )
+        image_storage.save_as(
+            variant_name(name, width),
+            ContentFile(_encode(variant, image_format)),
+        )
+    return image.size
+
+
+def delete_image(name):
+    """Удаляет картинку, её варианты и миниатюры."""
+    for width in IMAGE_VARIANT_WIDTHS:
+        image_storage.delete(variant_name(name, width))
+    delete_thumbnails(ImageFile(name, image_storage))
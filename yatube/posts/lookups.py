@@ -0,0 +1,70 @@
+"""Кеш разрешения slug группы и username автора из URL.
+
+В кеше лежат только значения полей, объект собирается через
+Model.from_db(), как после запроса. Для пользователя берутся id
+и поля для отображения — остальные отложены и при обращении
+догрузятся запросом. Несуществующие slug и username тоже
+запоминаются (на NEGATIVE_TIMEOUT), чтобы поток 404 не шёл в базу.
+Записи сбрасываются сигналами сохранения и удаления (posts/signals.py).
+В ключ идёт md5 значения: username с пробелами и кириллические slug
+memcached в ключе не примет, а в поиске значение приходит из запроса.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.http import Http404
+
+from yatube.constants import FEED_CACHE_TIMEOUT
+
+from .models import Group, User
+
+GROUP_KEY = 'group_slug:{}'
+AUTHOR_KEY = 'username:{}'
+GROUP_FIELDS = ('id', 'title', 'slug', 'description')
+AUTHOR_FIELDS = ('id', 'username', 'first_name', 'last_name')
+# Отметка «такого нет»: None в кеше не отличить от промаха.
+MISSING = 'missing'
+NEGATIVE_TIMEOUT = 60
+
+
+def _key(template, value):
+    return template.format(hashlib.md5(value.encode()).hexdigest())
+
+
+def _resolve(model, fields, key, lookup):
+    # from_db() ждёт значения в порядке полей модели
+    fields = [
+        field.attname for field in model._meta.concrete_fields
+        if field.attname in fields
+    ]
+    values = cache.get(key)
+    if values is None:
+        values = model.objects.filter(**lookup).values_list(*fields).first()
+        if values is None:
+            values = MISSING
+            cache.set(key, MISSING, NEGATIVE_TIMEOUT)
+        else:
+            cache.set(key, values, FEED_CACHE_TIMEOUT)
+    if values == MISSING:
+        raise Http404(f'{model._meta.object_name} не найден.')
+    return model.from_db('default', fields, values)
+
+
+def get_group_or_404(slug):
+    return _resolve(Group, GROUP_FIELDS, _key(GROUP_KEY, slug),
+                    {'slug': slug})
+
+
+def get_author_or_404(username):
+    return _resolve(User, AUTHOR_FIELDS, _key(AUTHOR_KEY, username),
+                    {'username': username})
+
+
+def forget_group(*slugs):
+    cache.delete_many([_key(GROUP_KEY, slug) for slug in slugs if slug])
+
+
+def forget_author(*usernames):
+    cache.delete_many(
+        [_key(AUTHOR_KEY, name) for name in usernames if name]
+    )
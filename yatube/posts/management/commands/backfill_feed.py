@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.feed import fill_feed
+from posts.models import Follow
+
+
+class Command(BaseCommand):
+    help = 'Заполняет ленты подписок по уже существующим подпискам.'
+
+    def handle(self, *args, **options):
+        count = 0
+        follows = Follow.objects.values_list('user_id', 'author_id')
+        for user_id, author_id in follows.iterator():
+            fill_feed(user_id, author_id)
+            count += 1
+        self.stdout.write(f'Обработано подписок: {count}')
@@ -0,0 +1,81 @@
+from statistics import median
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.test import RequestFactory
+
+from posts.models import Post, User
+from posts.utils import create_page_object, encode_cursor
+from yatube.constants import POSTS_PER_STR
+
+BENCH_USERNAME = 'bench_pagination'
+BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время первой и N-й страницы ленты '
+            'для ?page= и курсорной паджинации.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000000,
+                            help='Сколько постов должно быть в базе.')
+        parser.add_argument('--page', type=int, default=4000,
+                            help='Номер «глубокой» страницы.')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='База для замеров (алиас из DATABASES).')
+        parser.add_argument('--seed-missing', action='store_true',
+                            help='Дописать в базу недостающие посты.')
+
+    def handle(self, *args, **options):
+        database = options['database']
+        self.seed(database, options['posts'], options['seed_missing'])
+        posts = Post.objects.using(database).all()
+        page = options['page']
+        if page < 1:
+            raise CommandError('Номер страницы начинается с 1')
+        cases = {'?page=1': {'page': 1}}
+        if page > 1:
+            # у первой страницы нет предыдущей: курсор для неё не нужен
+            offset = (page - 1) * POSTS_PER_STR - 1
+            last_on_previous = posts.order_by('-pub_date', '-pk')[
+                offset:offset + 1
+            ].first()
+            if last_on_previous is None:
+                raise CommandError(f'В базе нет страницы {page}')
+            cases[f'?page={page}'] = {'page': page}
+            cases[f'?after= (страница {page})'] = {
+                'after': encode_cursor(last_on_previous)
+            }
+        factory = RequestFactory()
+        for name, params in cases.items():
+            request = factory.get('/', params)
+            timings = []
+            for _ in range(options['repeat']):
+                start = perf_counter()
+                list(create_page_object(request, posts, POSTS_PER_STR))
+                timings.append(perf_counter() - start)
+            self.stdout.write(f'{name}: {median(timings) * 1000:.2f} мс')
+
+    def seed(self, database, total, allowed):
+        missing = total - Post.objects.using(database).count()
+        if missing <= 0:
+            return
+        if not allowed:
+            raise CommandError(
+                f'В базе {database} не хватает {missing} постов. Чтобы '
+                f'записать их, добавьте --seed-missing (лучше вместе с '
+                f'--database с отдельной базой для замеров).'
+            )
+        author, _ = User.objects.db_manager(database).get_or_create(
+            username=BENCH_USERNAME
+        )
+        self.stdout.write(f'Создаём {missing} постов...')
+        while missing > 0:
+            size = min(missing, BATCH_SIZE)
+            Post.objects.using(database).bulk_create(
+                Post(author=author, text=f'Пост для замеров {i}')
+                for i in range(size)
+            )
+            missing -= size
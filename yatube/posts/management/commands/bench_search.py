@@ -0,0 +1,37 @@
+from statistics import median
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.search import search_page
+from yatube.constants import POSTS_PER_STR
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает поиск FTS5 с text__icontains на текущей базе '
+            '(наполнить её можно командой seed).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='+', help='Поисковые запросы.')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Постов в базе: {Post.objects.count()}')
+        for query in options['queries']:
+            cases = {
+                'icontains': lambda: list(
+                    Post.objects.filter(text__icontains=query)
+                    .select_related('author', 'group')[:POSTS_PER_STR]
+                ),
+                'fts5': lambda: list(search_page(query, POSTS_PER_STR)),
+            }
+            for name, run in cases.items():
+                timings = []
+                for _ in range(options['repeat']):
+                    start = perf_counter()
+                    run()
+                    timings.append(perf_counter() - start)
+                self.stdout.write(
+                    f'{query!r} {name}: {median(timings) * 1000:.2f} мс'
+                )
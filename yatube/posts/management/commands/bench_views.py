@@ -0,0 +1,96 @@
+import json
+import random
+from time import perf_counter
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    rank = max(int(round(percent / 100 * len(ordered))) - 1, 0)
+    return ordered[rank]
+
+
+class Command(BaseCommand):
+    help = ('Замеряет страницы лент через тестовый клиент и печатает '
+            'p50/p95/p99 времени ответа и число запросов в JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Запросов на каждую страницу.')
+        parser.add_argument('--cold', action='store_true',
+                            help='Очищать кеш перед каждым запросом.')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--output', default=None,
+                            help='Файл для JSON вместо stdout.')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        follow = Follow.objects.select_related('user').order_by('?').first()
+        reader = follow.user if follow else None
+        groups = list(Group.objects.values_list('slug', flat=True)[:1000])
+        posts = list(
+            Post.objects.values_list('pk', 'author__username')[:1000]
+        )
+        if not posts:
+            self.stderr.write('В базе нет постов: запустите manage.py seed.')
+            return
+        client = Client()
+        if reader:
+            client.force_login(reader)
+        pages = {
+            'posts:index': lambda: reverse('posts:index'),
+            'posts:group_posts': lambda: reverse(
+                'posts:group', args=[self.random.choice(groups)]),
+            'posts:profile': lambda: reverse(
+                'posts:profile', args=[self.random.choice(posts)[1]]),
+            'posts:post_detail': lambda: reverse(
+                'posts:post_detail', args=[self.random.choice(posts)[0]]),
+            'posts:follow_index': lambda: reverse('posts:follow_index'),
+        }
+        if not groups:
+            del pages['posts:group_posts']
+        if not reader:
+            del pages['posts:follow_index']
+        report = {
+            name: self.measure(client, make_url, options)
+            for name, make_url in pages.items()
+        }
+        result = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(result)
+        else:
+            self.stdout.write(result)
+
+    def measure(self, client, make_url, options):
+        timings, queries = [], []
+        for _ in range(options['requests']):
+            url = make_url()
+            if options['cold']:
+                cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                start = perf_counter()
+                client.get(url)
+                timings.append((perf_counter() - start) * 1000)
+            queries.append(len(context.captured_queries))
+        result = {
+            f'p{percent}_ms': round(percentile(timings, percent), 2)
+            for percent in PERCENTILES
+        }
+        result.update(
+            requests=len(timings),
+            queries_max=max(queries),
+            queries_avg=round(sum(queries) / len(queries), 2),
+        )
+        return result
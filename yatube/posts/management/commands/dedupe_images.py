@@ -0,0 +1,68 @@
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from sorl.thumbnail import delete as delete_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+from posts.caching import bump_feed_versions
+from posts.images import delete_image, save_variants
+from posts.models import Post, StoredImage
+from posts.storage import content_hash, hashed_name, image_storage
+from posts.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки постов в хранилище по содержимому: '
+            'одинаковые файлы сливаются в один, старые удаляются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только посчитать, ничего не менять.')
+
+    def handle(self, *args, **options):
+        names = list(
+            Post.objects.exclude(image='').order_by().values_list(
+                'image', flat=True
+            ).distinct()
+        )
+        moved = merged = freed = 0
+        for name in names:
+            if not image_storage.exists(name):
+                self.stderr.write(f'Нет файла: {name}')
+                continue
+            with image_storage.open(name) as source:
+                target = hashed_name(name, content_hash(source))
+                if target == name:
+                    continue
+                if image_storage.exists(target):
+                    merged += 1
+                    freed += image_storage.size(name)
+                else:
+                    moved += 1
+                    if not options['dry_run']:
+                        image_storage.save_as(target, source)
+            if options['dry_run']:
+                continue
+            with transaction.atomic():
+                Post.objects.filter(image=name).update(image=target)
+                StoredImage.objects.filter(name=name).delete()
+            # миниатюры, сделанные до хранилища по содержимому
+            delete_thumbnails(
+                ImageFile(name, default_storage), delete_file=False
+            )
+            delete_image(name)
+            # у слитых копий готовые варианты и миниатюры уже есть
+            if Post.objects.filter(
+                image=target, image_width__isnull=False
+            ).exists():
+                save_variants(target)
+            generate_thumbnails(target)
+        self.stdout.write(
+            f'Перенесено файлов: {moved}, слито дубликатов: {merged}, '
+            f'освобождено байт: {freed}'
+        )
+        if (moved or merged) and not options['dry_run']:
+            call_command('recount', stdout=self.stdout)
+            # в кешированных лентах остались старые адреса картинок
+            bump_feed_versions('index', 'follow')
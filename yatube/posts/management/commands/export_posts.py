@@ -0,0 +1,53 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from posts.export import CONTENT_TYPES, EXPORTS, export_lines
+
+
+def parse_moment(value):
+    """Дата или дата со временем из командной строки."""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class Command(BaseCommand):
+    help = ('Потоково выгружает посты, комментарии или подписки в JSONL '
+            'или CSV; память не зависит от размера таблицы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=EXPORTS)
+        parser.add_argument('--format', choices=CONTENT_TYPES,
+                            default='jsonl')
+        parser.add_argument('--output', default=None,
+                            help='Файл вместо stdout.')
+        parser.add_argument('--since', type=parse_moment, default=None,
+                            help='Не раньше этой даты (pub_date/created).')
+        parser.add_argument('--until', type=parse_moment, default=None,
+                            help='Раньше этой даты.')
+        parser.add_argument('--after-id', type=int, default=None,
+                            help='Только записи с id больше этого.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        lines = export_lines(
+            options['kind'], options['format'],
+            since=options['since'], until=options['until'],
+            after_id=options['after_id'], chunk_size=options['chunk_size'],
+        )
+        if options['output']:
+            with open(options['output'], 'w', newline='',
+                      encoding='utf-8') as output:
+                output.writelines(lines)
+            return
+        for line in lines:
+            self.stdout.write(line, ending='')
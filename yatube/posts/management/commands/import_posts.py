@@ -0,0 +1,257 @@
+import csv
+import json
+import os
+from contextlib import contextmanager
+from itertools import islice
+from time import perf_counter
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.caching import bump_feed_versions
+from posts.follows import forget_following
+from posts.models import (Comment, Follow, Group, ImportCheckpoint, Post,
+                          User)
+
+KINDS = ('posts', 'comments', 'follows')
+# Сколько username/slug держим в памяти между пачками.
+LOOKUP_CACHE_SIZE = 100000
+
+
+class RecordReader:
+    """Записи JSONL или CSV (по расширению файла) с места offset.
+
+    После каждой отданной записи self.offset — смещение в байтах сразу
+    за ней: по нему повторный запуск продолжает чтение без разбора уже
+    загруженных строк. Заголовок CSV перечитывается с начала файла.
+
+    Вместо строки JSONL, которая не разбирается или не является
+    объектом, отдаёт None: её считают пропущенной, а не обрывают импорт.
+    """
+
+    def __init__(self, path, offset=0):
+        self.path = path
+        self.offset = offset
+
+    def lines(self, source):
+        for line in source:
+            self.offset += len(line)
+            yield line
+
+    def __iter__(self):
+        with open(self.path, 'rb') as source:
+            if self.path.endswith('.csv'):
+                header = next(csv.reader(
+                    [source.readline().decode('utf-8')]
+                ), None)
+                self.offset = max(self.offset, source.tell())
+                source.seek(self.offset)
+                yield from csv.DictReader(
+                    (line.decode('utf-8') for line in self.lines(source)),
+                    fieldnames=header,
+                )
+                return
+            source.seek(self.offset)
+            for line in self.lines(source):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                yield record if isinstance(record, dict) else None
+
+
+def parse_id(value):
+    """id из файла или None, если это не целое число."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@contextmanager
+def keep_dates(*fields):
+    """Отключает auto_now_add, чтобы сохранить даты из старой системы."""
+    saved = [field.auto_now_add for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in zip(fields, saved):
+            field.auto_now_add = value
+
+
+class Lookup:
+    """Пакетное сопоставление username/slug с id."""
+
+    def __init__(self, model, field):
+        self.model = model
+        self.field = field
+        self.ids = {}
+
+    def load(self, keys):
+        missing = {key for key in keys if key and key not in self.ids}
+        if not missing:
+            return
+        if len(self.ids) + len(missing) > LOOKUP_CACHE_SIZE:
+            self.ids.clear()
+        self.ids.update(self.model.objects.filter(
+            **{f'{self.field}__in': missing}
+        ).values_list(self.field, 'pk'))
+
+    def get(self, key):
+        return self.ids.get(key)
+
+
+class Command(BaseCommand):
+    help = ('Потоково импортирует посты, комментарии или подписки из JSONL '
+            'или CSV пачками bulk_create; после сбоя продолжает с места '
+            'последней сохранённой пачки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .jsonl или .csv.')
+        parser.add_argument('--kind', choices=KINDS, default='posts')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--restart', action='store_true',
+                            help='Забыть сохранённый прогресс этого файла.')
+        parser.add_argument('--skip-rebuild', action='store_true',
+                            help='Не пересчитывать счётчики и ленты.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'Нет файла {path}')
+        self.users = Lookup(User, 'username')
+        self.groups = Lookup(Group, 'slug')
+        source = f'{options["kind"]}:{os.path.abspath(path)}'
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(source=source)
+        if options['restart']:
+            checkpoint.position = checkpoint.offset = 0
+        reader = RecordReader(path, checkpoint.offset)
+        records = iter(reader)
+        if checkpoint.position and not checkpoint.offset:
+            # прогресс сохранён до появления offset: пропускаем записи
+            records = islice(records, checkpoint.position, None)
+        if checkpoint.position:
+            self.stdout.write(f'Продолжаем с записи {checkpoint.position}')
+        build = getattr(self, f'build_{options["kind"]}')
+        model = {'posts': Post, 'comments': Comment, 'follows': Follow}[
+            options['kind']
+        ]
+        imported = skipped = 0
+        start = perf_counter()
+        with keep_dates(Post._meta.get_field('pub_date'),
+                        Comment._meta.get_field('created')):
+            while True:
+                chunk = list(islice(records, options['chunk_size']))
+                if not chunk:
+                    break
+                objects = build([row for row in chunk if row is not None])
+                with transaction.atomic():
+                    model.objects.bulk_create(
+                        objects, ignore_conflicts=model is Follow
+                    )
+                    # прогресс фиксируется в той же транзакции,
+                    # что и данные: пачка не запишется дважды
+                    checkpoint.position += len(chunk)
+                    checkpoint.offset = reader.offset
+                    checkpoint.save(update_fields=['position', 'offset'])
+                if model is Follow:
+                    forget_following(*{obj.user_id for obj in objects})
+                imported += len(objects)
+                skipped += len(chunk) - len(objects)
+                elapsed = perf_counter() - start
+                self.stdout.write(
+                    f'{checkpoint.position} записей, импортировано '
+                    f'{imported}, пропущено {skipped}, '
+                    f'{imported / elapsed:.0f} строк/с'
+                )
+        if imported and model is Post:
+            self.reset_sequence()
+        if imported and not options['skip_rebuild']:
+            # bulk_create не шлёт сигналов
+            call_command('recount', stdout=self.stdout)
+            call_command('backfill_feed', stdout=self.stdout)
+            bump_feed_versions('index', 'follow')
+
+    def reset_sequence(self):
+        # посты вставлены со своими id: сдвигаем последовательность
+        # (в SQLite не нужно, в PostgreSQL — иначе конфликт ключей)
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Post]):
+                cursor.execute(sql)
+
+    def build_posts(self, chunk):
+        """Посты со старыми id, чтобы к ним привязались комментарии.
+
+        Строки без текста, с неизвестным автором или с id, который уже
+        есть в базе (повторный импорт), пропускаются.
+        """
+        self.users.load(row.get('author') for row in chunk)
+        self.groups.load(row.get('group') for row in chunk)
+        taken = set(Post.objects.filter(pk__in={
+            parse_id(row['id']) for row in chunk if row.get('id')
+        }).values_list('pk', flat=True))
+        posts, now = [], timezone.now()
+        for row in chunk:
+            author_id = self.users.get(row.get('author'))
+            if author_id is None or not row.get('text'):
+                continue
+            pk = None
+            if row.get('id'):
+                pk = parse_id(row['id'])
+                if pk is None or pk in taken:
+                    continue
+                taken.add(pk)
+            post = Post(
+                pk=pk,
+                author_id=author_id,
+                group_id=self.groups.get(row.get('group')),
+                text=row['text'],
+                image=row.get('image') or '',
+                pub_date=parse_datetime(row.get('pub_date') or '') or now,
+            )
+            # bulk_create не вызывает save()
+            post.render()
+            posts.append(post)
+        return posts
+
+    def build_comments(self, chunk):
+        self.users.load(row.get('author') for row in chunk)
+        post_ids = set(Post.objects.filter(
+            pk__in={parse_id(row.get('post')) for row in chunk}
+        ).values_list('pk', flat=True))
+        comments, now = [], timezone.now()
+        for row in chunk:
+            author_id = self.users.get(row.get('author'))
+            post_id = parse_id(row.get('post'))
+            if (author_id is None or post_id not in post_ids
+                    or not row.get('text')):
+                continue
+            comments.append(Comment(
+                post_id=post_id,
+                author_id=author_id,
+                text=row['text'],
+                created=parse_datetime(row.get('created') or '') or now,
+            ))
+        return comments
+
+    def build_follows(self, chunk):
+        self.users.load(
+            name for row in chunk for name in (row.get('user'),
+                                               row.get('author'))
+        )
+        follows = []
+        for row in chunk:
+            user_id = self.users.get(row.get('user'))
+            author_id = self.users.get(row.get('author'))
+            if None in (user_id, author_id) or user_id == author_id:
+                continue
+            follows.append(Follow(user_id=user_id, author_id=author_id))
+        return follows
@@ -0,0 +1,40 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.images import save_variants
+from posts.models import Post
+from posts.thumbnails import generate_in_thread
+
+
+class Command(BaseCommand):
+    help = ('Готовит миниатюры и варианты для srcset для уже '
+            'загруженных картинок постов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=max(settings.THUMBNAIL_WORKERS, 1)
+        )
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').values_list(
+            'image', flat=True
+        ).distinct()
+        count = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for _ in executor.map(generate_in_thread, names.iterator()):
+                count += 1
+        self.stdout.write(f'Готовы миниатюры для картинок: {count}')
+        # картинки, принятые до posts.images: размеры и варианты srcset
+        names = Post.objects.exclude(image='').filter(
+            image_width__isnull=True
+        ).values_list('image', flat=True).distinct()
+        count = 0
+        for name in names.iterator():
+            width, height = save_variants(name)
+            Post.objects.filter(image=name).update(
+                image_width=width, image_height=height
+            )
+            count += 1
+        self.stdout.write(f'Готовы варианты для картинок: {count}')
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from posts.counters import (comment_count_mismatches, image_ref_mismatches,
+                            release_image)
+from posts.models import Post, PostCounter, StoredImage, User
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики постов авторов, комментариев '
+            'постов и ссылок на картинки и чинит расхождения.')
+
+    def handle(self, *args, **options):
+        fixed = 0
+        authors = User.objects.annotate(
+            actual=Count('posts')
+        ).values_list('pk', 'actual')
+        with transaction.atomic():
+            for author_id, actual in authors.iterator():
+                counter, created = PostCounter.objects.get_or_create(
+                    author_id=author_id, defaults={'posts_count': actual}
+                )
+                if not created and counter.posts_count != actual:
+                    counter.posts_count = actual
+                    counter.save(update_fields=['posts_count'])
+                    fixed += 1
+                elif created and actual:
+                    fixed += 1
+        self.stdout.write(f'Исправлено счётчиков: {fixed}')
+        fixed = 0
+        with transaction.atomic():
+            for post_id, actual in comment_count_mismatches().iterator():
+                Post.objects.filter(pk=post_id).update(comment_count=actual)
+                fixed += 1
+        self.stdout.write(f'Исправлено счётчиков комментариев: {fixed}')
+        fixed = 0
+        with transaction.atomic():
+            for name, actual in image_ref_mismatches():
+                StoredImage.objects.update_or_create(
+                    name=name, defaults={'ref_count': actual}
+                )
+                if not actual:
+                    # файл без ссылок удалится после коммита
+                    release_image(name)
+                fixed += 1
+        self.stdout.write(f'Исправлено счётчиков ссылок на картинки: {fixed}')
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.caching import bump_feed_versions
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Заполняет готовый HTML текста и отрывка у постов, '
+            'сохранённых до его появления.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Пересобрать HTML у всех постов.')
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        posts = Post.objects.only('pk', 'text').order_by('pk')
+        if not options['all']:
+            posts = posts.filter(text_html='')
+        count, last_pk = 0, 0
+        while True:
+            # по ключу, а не OFFSET: обновлённые строки выпадают из выборки
+            chunk = list(posts.filter(pk__gt=last_pk)[:options['chunk_size']])
+            if not chunk:
+                break
+            for post in chunk:
+                post.render()
+            with transaction.atomic():
+                Post.objects.bulk_update(chunk, ['text_html', 'excerpt_html'])
+            count += len(chunk)
+            last_pk = chunk[-1].pk
+        self.stdout.write(f'Обновлён HTML постов: {count}')
+        if count:
+            bump_feed_versions('index', 'follow')
@@ -0,0 +1,143 @@
+import io
+import random
+from itertools import islice
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from faker import Faker
+from PIL import Image
+
+from posts.caching import bump_feed_versions
+from posts.models import Comment, Follow, Group, Post, User
+
+# Тексты берём из заранее созданного набора: Faker на миллион
+# строк работает дольше самой вставки.
+TEXT_POOL_SIZE = 1000
+IMAGE_POOL_SIZE = 20
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = ('Наполняет базу тестовыми пользователями, группами, постами, '
+            'комментариями и подписками через bulk_create.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--images', type=float, default=0.1,
+                            help='Доля постов с картинкой.')
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None,
+                            help='Зерно генератора для повторяемости.')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.faker = Faker('ru_RU')
+        self.faker.seed_instance(options['seed'])
+        self.batch_size = options['batch_size']
+        self.texts = [
+            self.faker.paragraph() for _ in range(TEXT_POOL_SIZE)
+        ]
+        users = self.create(User, options['users'], self.make_user)
+        groups = self.create(Group, options['groups'], self.make_group)
+        # ничего нового не создали — опираемся на то, что уже есть в базе
+        users = users or list(User.objects.values_list('pk', flat=True))
+        groups = groups or list(Group.objects.values_list('pk', flat=True))
+        images = self.make_images() if options['images'] else []
+        posts = self.create(
+            Post, options['posts'],
+            lambda i: self.make_post(users, groups, images, options['images'])
+        )
+        posts = posts or list(Post.objects.values_list('pk', flat=True))
+        self.create(
+            Comment, options['comments'],
+            lambda i: Comment(
+                post_id=self.random.choice(posts),
+                author_id=self.random.choice(users),
+                text=self.random.choice(self.texts)[:200],
+            )
+        )
+        self.create_follows(users, options['follows'])
+        # bulk_create не шлёт сигналов: достраиваем счётчики и ленты
+        call_command('recount', stdout=self.stdout)
+        call_command('backfill_feed', stdout=self.stdout)
+        bump_feed_versions('index', 'follow')
+
+    def create(self, model, total, make):
+        """Вставляет total объектов пачками и возвращает диапазон их id."""
+        start = (model.objects.aggregate(Max('pk'))['pk__max'] or 0) + 1
+        rows = (make(start + i) for i in range(total))
+        for batch in batched(rows, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+        self.stdout.write(f'{model._meta.verbose_name_plural}: +{total}')
+        end = model.objects.aggregate(Max('pk'))['pk__max'] or 0
+        return range(start, end + 1)
+
+    def make_user(self, i):
+        return User(
+            username=f'seed_{i}',
+            first_name=self.faker.first_name(),
+            last_name=self.faker.last_name(),
+            password='!',
+        )
+
+    def make_group(self, i):
+        return Group(
+            title=self.faker.catch_phrase()[:200],
+            slug=f'seed-group-{i}',
+            description=self.random.choice(self.texts),
+        )
+
+    def make_post(self, users, groups, images, image_share):
+        with_image = images and self.random.random() < image_share
+        post = Post(
+            author_id=self.random.choice(users),
+            group_id=self.random.choice(groups) if groups else None,
+            text=self.random.choice(self.texts),
+            image=self.random.choice(images) if with_image else '',
+        )
+        post.render()
+        return post
+
+    def make_images(self):
+        """Небольшой набор картинок, который делят между собой посты."""
+        names = []
+        for i in range(IMAGE_POOL_SIZE):
+            buffer = io.BytesIO()
+            color = tuple(self.random.randrange(256) for _ in range(3))
+            Image.new('RGB', (1280, 720), color).save(buffer, 'JPEG')
+            names.append(default_storage.save(
+                f'posts/seed_{i}.jpg', ContentFile(buffer.getvalue())
+            ))
+        return names
+
+    def create_follows(self, users, total):
+        if len(users) < 2:
+            return
+        pairs = set()
+        while len(pairs) < min(total, len(users) * (len(users) - 1)):
+            user, author = self.random.sample(users, 2)
+            pairs.add((user, author))
+        for batch in batched(pairs, self.batch_size):
+            Follow.objects.bulk_create(
+                (Follow(user_id=user, author_id=author)
+                 for user, author in batch),
+                ignore_conflicts=True,
+            )
+        self.stdout.write(f'Подписки: +{len(pairs)}')
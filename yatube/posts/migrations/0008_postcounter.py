@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:03
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    PostCounter = apps.get_model('posts', 'PostCounter')
+    counts = Post.objects.values('author').annotate(total=Count('pk'))
+    PostCounter.objects.bulk_create(
+        PostCounter(author_id=row['author'], posts_count=row['total'])
+        for row in counts
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0007_feeditem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostCounter',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='post_counter', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Число постов')),
+            ],
+            options={
+                'verbose_name': 'Счётчик постов',
+                'verbose_name_plural': 'Счётчики постов',
+            },
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
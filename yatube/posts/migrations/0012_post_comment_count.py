@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:19
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_comment_counts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    counts = Comment.objects.values('post').annotate(total=Count('pk'))
+    for row in counts.iterator():
+        Post.objects.filter(pk=row['post']).update(
+            comment_count=row['total']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_importcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число комментариев'),
+        ),
+        migrations.RunPython(fill_comment_counts, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,11 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, router, transaction
 
 from core.models import CreatedModel
 
+from .rendering import render_excerpt, render_text
+from .storage import image_storage
+
 User = get_user_model()
 
 
@@ -38,17 +41,116 @@ class Post(CreatedModel):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=image_storage,
         blank=True
     )
+    # Размеры нужны srcset без чтения файла. Заполняет их PostForm
+    # при приёме картинки (posts/images.py), а не width_field:
+    # тот открывал бы файл при загрузке каждого поста без размеров.
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки', null=True, blank=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки', null=True, blank=True, editable=False
+    )
+    # Готовый HTML текста: шаблоны не прогоняют его через фильтры
+    # на каждом показе. Обновляется в save(), см. posts/rendering.py.
+    text_html = models.TextField('Текст в HTML', blank=True, editable=False)
+    excerpt_html = models.TextField(
+        'Отрывок в HTML', blank=True, editable=False
+    )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
+    # поддерживается сигналами комментариев, см. posts/counters.py
+    comment_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(fields=['pub_date'], name='post_pub_date_idx'),
+            models.Index(fields=['author', 'pub_date'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', 'pub_date'],
+                         name='post_group_pub_date_idx'),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
     def __str__(self):
         return self.text[:15]
 
+    @property
+    def is_truncated(self):
+        """Отрывок в ленте короче полного текста."""
+        return self.excerpt_html != self.text_html
+
+    def render(self):
+        self.text_html = render_text(self.text)
+        self.excerpt_html = render_excerpt(self.text)
+
+    def save(self, *args, update_fields=None, **kwargs):
+        """Сохраняет пост вместе с тем, что делают его сигналы.
+
+        Django шлёт post_save уже после своей транзакции INSERT: без
+        общей транзакции сбой между ними оставил бы пост без счётчика
+        постов автора, ленты подписчиков и ссылки на картинку.
+        """
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self
+        )
+        with transaction.atomic(using=using):
+            self._save(*args, update_fields=update_fields, **kwargs)
+
+    def _save(self, *args, update_fields=None, **kwargs):
+        if update_fields is None or 'text' in update_fields:
+            self.render()
+        if update_fields is not None:
+            if 'image' in update_fields:
+                update_fields = {
+                    *update_fields, 'image_width', 'image_height'
+                }
+            if 'text' in update_fields:
+                update_fields = {*update_fields, 'text_html', 'excerpt_html'}
+        super().save(*args, update_fields=update_fields, **kwargs)
+
+
+class PostCounter(models.Model):
+    """Число постов автора, которое поддерживается при записи."""
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='post_counter',
+        verbose_name='Автор',
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчик постов'
+        verbose_name_plural = 'Счётчики постов'
+
+    def __str__(self):
+        return f'{self.author}: {self.posts_count}'
+
+
+class StoredImage(models.Model):
+    """Файл картинки в хранилище по содержимому и число ссылок на него."""
+    name = models.CharField('Файл', max_length=100, unique=True)
+    ref_count = models.PositiveIntegerField('Число ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self):
+        return f'{self.name}: {self.ref_count}'
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -73,6 +175,11 @@ class Comment(models.Model):
     )
 
     class Meta:
+        ordering = ('created',)
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -102,3 +209,54 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}'
+
+
+class FeedItem(models.Model):
+    """Пост в ленте подписок читателя.
+
+    Строки добавляются при публикации поста и при подписке,
+    поэтому лента читается одним проходом по индексу.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_feed_user_post')
+        ]
+        indexes = [
+            models.Index(fields=['user', 'pub_date', 'post'],
+                         name='feed_user_pub_date_idx')
+        ]
+
+    def __str__(self):
+        return f'{self.post} в ленте {self.user}'
+
+
+class ImportCheckpoint(models.Model):
+    """Сколько записей файла импорта уже сохранено (см. import_posts)."""
+    source = models.CharField('Источник', max_length=255, unique=True)
+    position = models.PositiveIntegerField('Обработано записей', default=0)
+    # с этого байта продолжается чтение файла
+    offset = models.BigIntegerField('Смещение в файле', default=0)
+
+    class Meta:
+        verbose_name = 'Прогресс импорта'
+        verbose_name_plural = 'Прогресс импорта'
+
+    def __str__(self):
+        return f'{self.source}: {self.position}'
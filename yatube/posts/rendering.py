@@ -0,0 +1,20 @@
+"""HTML текста поста, который готовится при записи, а не на каждом показе.
+
+Результат хранится в Post.text_html и Post.excerpt_html (см. Post.save).
+При изменении правил разметки старые строки пересобирает команда
+render_posts --all.
+"""
+from django.template.defaultfilters import linebreaksbr
+from django.utils.text import Truncator
+
+from yatube.constants import POST_EXCERPT_LENGTH
+
+
+def render_text(text):
+    """То же, что {{ text|linebreaksbr }} в шаблоне."""
+    return linebreaksbr(text, autoescape=True)
+
+
+def render_excerpt(text):
+    """Начало текста для лент, не длиннее POST_EXCERPT_LENGTH."""
+    return render_text(Truncator(text).chars(POST_EXCERPT_LENGTH))
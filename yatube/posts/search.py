@@ -0,0 +1,154 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Индекс posts_post_fts — external content таблица над posts_post,
+её синхронизируют триггеры. SQLite при изменении схемы posts_post
+пересоздаёт таблицу и теряет триггеры, поэтому ensure_fts()
+вызывается после каждого migrate и при необходимости
+восстанавливает их и перестраивает индекс.
+"""
+import base64
+import binascii
+
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+from .utils import CursorPage
+
+FTS_TABLE = 'posts_post_fts'
+FTS_TRIGGERS = {
+    'posts_post_fts_insert': f'''
+        CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post
+        BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+        END''',
+    'posts_post_fts_delete': f'''
+        CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post
+        BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+        END''',
+    'posts_post_fts_update': f'''
+        CREATE TRIGGER posts_post_fts_update AFTER UPDATE OF text
+        ON posts_post
+        BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+            INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+        END''',
+}
+
+
+def ensure_fts(using='default'):
+    """Создаёт FTS-таблицу и триггеры, если их нет."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')"
+            " AND name LIKE %s", [f'{FTS_TABLE}%']
+        )
+        existing = {name for name, in cursor.fetchall()}
+        missing = set(FTS_TRIGGERS) - existing
+        if FTS_TABLE in existing and not missing:
+            return
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+            "text, content='posts_post', content_rowid='id', "
+            "tokenize='unicode61')"
+        )
+        for name in missing:
+            cursor.execute(FTS_TRIGGERS[name])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+        )
+
+
+def to_match_query(text):
+    """Превращает ввод пользователя в запрос FTS5: все слова, как есть."""
+    words = text.split()
+    return ' '.join('"{}"'.format(word.replace('"', '""')) for word in words)
+
+
+def matching_ids(text):
+    """Подзапрос id постов для queryset.filter(pk__in=...)."""
+    return RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [to_match_query(text)]
+    )
+
+
+def encode_rank_cursor(rank, pk):
+    raw = f'{rank!r}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_rank_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        rank, pk = raw.decode().split('|')
+        return float(rank), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def search_page(text, per_page, group=None, author=None,
+                after=None, before=None):
+    """Страница найденных постов по релевантности (bm25, затем id).
+
+    Постраничный переход — по курсору (rank, id), как в лентах.
+    """
+    # как posts.utils._page_by_cursor: сначала after, затем before
+    backward, cursor_value = False, decode_rank_cursor(after or '')
+    if cursor_value is None:
+        cursor_value = decode_rank_cursor(before or '')
+        backward = cursor_value is not None
+    sql = [
+        f'SELECT p.id, bm25({FTS_TABLE}) AS score FROM {FTS_TABLE} '
+        f'JOIN posts_post p ON p.id = {FTS_TABLE}.rowid '
+        f'WHERE {FTS_TABLE} MATCH %s'
+    ]
+    params = [to_match_query(text)]
+    if group is not None:
+        sql.append('AND p.group_id = %s')
+        params.append(group.pk)
+    if author is not None:
+        sql.append('AND p.author_id = %s')
+        params.append(author.pk)
+    if cursor_value is not None:
+        sign = '<' if backward else '>'
+        rank, pk = cursor_value
+        sql.append(
+            f'AND (bm25({FTS_TABLE}) {sign} %s '
+            f'OR (bm25({FTS_TABLE}) = %s AND p.id {sign} %s))'
+        )
+        params.extend((rank, rank, pk))
+    direction = 'DESC' if backward else 'ASC'
+    sql.append(f'ORDER BY score {direction}, p.id {direction} LIMIT %s')
+    params.append(per_page + 1)
+    with connections['default'].cursor() as cursor:
+        cursor.execute(' '.join(sql), params)
+        rows = cursor.fetchall()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backward:
+        rows.reverse()
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [pk for pk, _ in rows]
+    )
+    page = CursorPage(
+        [posts[pk] for pk, _ in rows if pk in posts], None,
+        # соседнюю страницу с той стороны, откуда пришли, не проверяем
+        has_next=has_more if not backward else True,
+        has_previous=has_more if backward else cursor_value is not None,
+    )
+    page.next_cursor = (
+        encode_rank_cursor(rows[-1][1], rows[-1][0])
+        if rows and page.has_next() else None
+    )
+    page.previous_cursor = (
+        encode_rank_cursor(rows[0][1], rows[0][0])
+        if rows and page.has_previous() else None
+    )
+    return page
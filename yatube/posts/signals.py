@@ -0,0 +1,207 @@
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from .caching import POST_FEED_FIELDS, bump_feed_versions
+from .counters import (acquire_image, decrement_comment_count,
+                       decrement_posts_count, increment_comment_count,
+                       increment_posts_count, release_image)
+from .feed import drop_feed, fill_feed, push_post
+from .follows import forget_following
+from .lookups import AUTHOR_FIELDS, forget_author, forget_group
+from .models import Comment, Follow, Group, Post, User
+from .thumbnails import schedule_thumbnails
+
+
+class DeletingPosts:
+    """id постов, которые удаляются в текущей транзакции.
+
+    Их комментарии уходят каскадом, и счётчик комментариев удаляемого
+    поста менять незачем. Набор живёт как on_commit-колбэк: после
+    коммита он очищается, а при откате (или ошибке посреди удаления)
+    Django выбрасывает колбэк вместе с отметками.
+    """
+
+    def __init__(self):
+        self.posts = set()
+
+    def __call__(self):
+        self.posts.clear()
+
+
+def _mark_deleting(pk):
+    connection = transaction.get_connection()
+    savepoints = set(connection.savepoint_ids)
+    for sids, callback in connection.run_on_commit:
+        # отметки из той же точки сохранения: её откат снимет их
+        if isinstance(callback, DeletingPosts) and sids == savepoints:
+            callback.posts.add(pk)
+            return
+    deleting = DeletingPosts()
+    deleting.posts.add(pk)
+    transaction.on_commit(deleting)
+
+
+def _is_deleting(post_id):
+    return any(
+        post_id in callback.posts
+        for _, callback in transaction.get_connection().run_on_commit
+        if isinstance(callback, DeletingPosts)
+    )
+
+
+def _touches(update_fields, fields):
+    """Затронуты ли поля: без update_fields сохраняется вся строка."""
+    return update_fields is None or bool(set(update_fields) & set(fields))
+
+
+@receiver(post_save, sender=Post)
+def post_to_feeds(sender, instance, created, **kwargs):
+    if created:
+        increment_posts_count(instance.author_id)
+        push_post(instance)
+
+
+@receiver(pre_delete, sender=Post)
+def post_removing(sender, instance, **kwargs):
+    # pre_delete всех объектов каскада приходит раньше их post_delete;
+    # Collector.delete() шлёт его уже внутри своей транзакции
+    _mark_deleting(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_removed(sender, instance, **kwargs):
+    decrement_posts_count(instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+def comment_added(sender, instance, created, **kwargs):
+    if created:
+        increment_comment_count(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_removed(sender, instance, **kwargs):
+    if not _is_deleting(instance.post_id):
+        decrement_comment_count(instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_to_feed(sender, instance, created, **kwargs):
+    if created:
+        fill_feed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def unfollow_from_feed(sender, instance, **kwargs):
+    drop_feed(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def invalidate_feeds_on_edit(sender, update_fields=None, **kwargs):
+    if _touches(update_fields, POST_FEED_FIELDS):
+        bump_feed_versions('index', 'follow')
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+def invalidate_feeds(sender, **kwargs):
+    bump_feed_versions('index', 'follow')
+
+
+@receiver(post_delete, sender=Comment)
+def invalidate_feeds_on_uncomment(sender, instance, **kwargs):
+    # при удалении поста ленты сбросит он сам
+    if not _is_deleting(instance.post_id):
+        bump_feed_versions('index', 'follow')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_feeds(sender, **kwargs):
+    bump_feed_versions('index')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_feed(sender, instance, **kwargs):
+    forget_following(instance.user_id)
+    bump_feed_versions('follow')
+
+
+@receiver(pre_save, sender=Post)
+def remember_image(sender, instance, update_fields=None, **kwargs):
+    # при замене картинки ссылку на старый файл нужно снять
+    if instance.pk and _touches(update_fields, ('image',)):
+        instance._stored_image = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('image', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def image_changed(sender, instance, update_fields=None, **kwargs):
+    if not _touches(update_fields, ('image',)):
+        return
+    old = instance.__dict__.pop('_stored_image', None)
+    new = instance.image.name
+    if old == new:
+        # картинка та же: миниатюры и варианты уже поставлены в очередь
+        return
+    if new:
+        acquire_image(new)
+        # варианты для srcset и миниатюры делаются после коммита;
+        # пока их нет, шаблон показывает исходную картинку
+        schedule_thumbnails(instance.image, size=(
+            (instance.image_width, instance.image_height)
+            if instance.image_width else None
+        ))
+    if old:
+        release_image(old)
+
+
+@receiver(post_delete, sender=Post)
+def release_post_image(sender, instance, **kwargs):
+    if instance.image:
+        release_image(instance.image.name)
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_slug(sender, instance, **kwargs):
+    # при смене slug сбросить нужно и старый ключ
+    if instance.pk:
+        instance._cached_slug = Group.objects.filter(
+            pk=instance.pk
+        ).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def forget_group_slug(sender, instance, **kwargs):
+    forget_group(instance.slug, getattr(instance, '_cached_slug', None))
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, update_fields=None, **kwargs):
+    # вход пользователя сохраняет только last_login — это не наш случай
+    if instance.pk and _touches(update_fields, AUTHOR_FIELDS):
+        instance._cached_username = User.objects.filter(
+            pk=instance.pk
+        ).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def forget_saved_username(sender, instance, created, update_fields=None,
+                          **kwargs):
+    if _touches(update_fields, AUTHOR_FIELDS):
+        forget_author(
+            instance.username, getattr(instance, '_cached_username', None)
+        )
+        # имя автора есть в каждой карточке поста в лентах
+        if not created:
+            bump_feed_versions('index', 'follow')
+
+
+@receiver(post_delete, sender=User)
+def forget_deleted_username(sender, instance, **kwargs):
+    forget_author(instance.username)
@@ -0,0 +1,59 @@
+"""Хранилище картинок постов, адресуемое по содержимому.
+
+Файл называется по sha256 содержимого: posts/ab/<хеш>.jpg. Одинаковые
+картинки ложатся в один файл, а миниатюры sorl и варианты для srcset
+выводятся из имени файла — значит, у копий они тоже общие. Сколько
+постов ссылается на файл, хранит StoredImage (posts/counters.py);
+файл без ссылок удаляется после коммита (posts.images.delete_image).
+"""
+import hashlib
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+CHUNK_SIZE = 64 * 1024
+
+
+def content_hash(content):
+    """sha256 содержимого файла в шестнадцатеричном виде."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def hashed_name(name, digest):
+    """Имя файла в хранилище: папка и расширение name, имя — хеш."""
+    folder = posixpath.dirname(name)
+    ext = posixpath.splitext(name)[1].lower()
+    return posixpath.join(folder, digest[:2], digest + ext)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище, которое не пишет один файл дважды."""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = hashed_name(self.generate_filename(name), content_hash(content))
+        if self.exists(name):
+            # такая картинка уже есть: файл один на все копии
+            return name
+        return super().save(name, content, max_length)
+
+    def save_as(self, name, content):
+        """Сохраняет файл под именем name, а не по хешу.
+
+        Для производных файлов, имя которых выводится из имени
+        картинки, — вариантов для srcset.
+        """
+        return super().save(name, content)
+
+
+image_storage = ContentAddressedStorage()
@@ -0,0 +1,44 @@
+from django import template
+
+from posts.images import variant_name, variant_widths
+from posts.storage import image_storage
+from posts.thumbnails import get_prebuilt_thumbnail
+
+register = template.Library()
+
+
+@register.simple_tag
+def prebuilt_thumbnail(image, geometry):
+    """Миниатюра, подготовленная заранее; на запросе её не создаём."""
+    if not image:
+        return None
+    return get_prebuilt_thumbnail(image, geometry)
+
+
+@register.simple_tag
+def responsive_image(post, max_width=960):
+    """src и srcset картинки поста из её вариантов по ширине.
+
+    None, если размеры картинки неизвестны (загружена до приёма
+    через posts.images) или варианты ещё готовятся после коммита —
+    тогда шаблон показывает её как раньше.
+    """
+    if not post.image or not post.image_width:
+        return None
+    name = post.image.name
+    widths = variant_widths(post.image_width)
+    # самый широкий вариант сохраняется последним
+    if widths and not image_storage.exists(variant_name(name, widths[-1])):
+        return None
+    candidates = [
+        (image_storage.url(variant_name(name, width)), width)
+        for width in widths
+    ]
+    candidates.append((image_storage.url(name), post.image_width))
+    src = [url for url, width in candidates if width <= max_width]
+    return {
+        'src': src[-1] if src else candidates[0][0],
+        'srcset': ', '.join(f'{url} {width}w' for url, width in candidates),
+        'width': post.image_width,
+        'height': post.image_height,
+    }
@@ -0,0 +1,82 @@
+from http import HTTPStatus
+
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from yatube.constants import POSTS_PER_STR
+
+from ..models import Comment, Follow, Group, Post, User
+from .utils import query_budget
+
+
+class FeedApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(
+            title='Группа', slug='api-group', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(POSTS_PER_STR + 2):
+            cls.post = Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}'
+            )
+        for i in range(3):
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text=f'Комментарий {i}')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_feeds_embed_related_once(self):
+        """Авторы и группы приходят один раз, посты ссылаются на них."""
+        urls = (
+            reverse('posts:api_index'),
+            reverse('posts:api_group', args=[self.group.slug]),
+            reverse('posts:api_profile', args=[self.author.username]),
+            reverse('posts:api_follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                # сессия, пользователь, страница, авторы, группы
+                with query_budget(self, 7):
+                    data = self.client.get(url).json()
+                self.assertEqual(len(data['posts']), POSTS_PER_STR)
+                self.assertEqual(data['posts'][0]['text'], self.post.text)
+                self.assertEqual(
+                    data['authors'],
+                    {str(self.author.pk): {
+                        'username': 'author',
+                        'first_name': 'Лев',
+                        'last_name': 'Толстой',
+                    }}
+                )
+                self.assertEqual(list(data['groups']), [str(self.group.pk)])
+
+    def test_cursor_paging(self):
+        url = reverse('posts:api_index')
+        first = self.client.get(url).json()
+        second = self.client.get(url, {'after': first['next']}).json()
+        self.assertEqual(len(second['posts']), 2)
+        self.assertIsNone(second['next'])
+        back = self.client.get(url, {'before': second['previous']}).json()
+        self.assertEqual(back['posts'], first['posts'])
+
+    def test_post_detail_with_comments(self):
+        data = self.client.get(
+            reverse('posts:api_post_detail', args=[self.post.pk])).json()
+        self.assertEqual(data['post']['id'], self.post.pk)
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']],
+            ['Комментарий 0', 'Комментарий 1', 'Комментарий 2']
+        )
+        self.assertEqual(
+            set(data['authors']), {str(self.author.pk), str(self.reader.pk)})
+
+    def test_follow_requires_login(self):
+        response = Client().get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
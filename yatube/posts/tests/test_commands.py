@@ -0,0 +1,303 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import (Comment, FeedItem, Follow, Group, ImportCheckpoint,
+                      Post, PostCounter, StoredImage, User)
+from ..storage import content_hash, hashed_name
+from .test_forms import SMALL_GIF
+
+
+class SeedCommandTest(TestCase):
+    def test_seed_and_bench(self):
+        """seed наполняет базу, bench_views отчитывается по всем лентам."""
+        call_command(
+            'seed', users=5, groups=2, posts=30, images=0, comments=10,
+            follows=4, seed=1, stdout=StringIO()
+        )
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Group.objects.count(), 2)
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(Comment.objects.count(), 10)
+        self.assertEqual(Follow.objects.count(), 4)
+        self.assertTrue(FeedItem.objects.exists())
+        self.assertEqual(
+            sum(PostCounter.objects.values_list('posts_count', flat=True)),
+            30
+        )
+
+        output = StringIO()
+        call_command('bench_views', requests=3, seed=1, stdout=output)
+        report = json.loads(output.getvalue())
+        self.assertEqual(set(report), {
+            'posts:index', 'posts:group_posts', 'posts:profile',
+            'posts:post_detail', 'posts:follow_index',
+        })
+        self.assertEqual(report['posts:index']['requests'], 3)
+
+
+class BenchPaginationCommandTest(TestCase):
+    def test_first_page(self):
+        author = User.objects.create_user(username='author')
+        Post.objects.create(author=author, text='Пост')
+        output = StringIO()
+        call_command('bench_pagination', posts=1, page=1, repeat=1,
+                     stdout=output)
+        self.assertEqual(len(output.getvalue().splitlines()), 1)
+
+    def test_seeding_needs_flag(self):
+        """Без --seed-missing команда не пишет посты в базу."""
+        with self.assertRaises(CommandError):
+            call_command('bench_pagination', posts=5, stdout=StringIO())
+        self.assertFalse(Post.objects.exists())
+        output = StringIO()
+        call_command('bench_pagination', posts=25, page=2, repeat=1,
+                     seed_missing=True, stdout=output)
+        self.assertEqual(Post.objects.count(), 25)
+        self.assertEqual(len(output.getvalue().splitlines()), 4)
+
+
+class ImportPostsCommandTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        source = tempfile.NamedTemporaryFile(
+            'w', suffix='.jsonl', delete=False
+        )
+        with source:
+            for i in range(5):
+                source.write(json.dumps({
+                    'author': 'author' if i != 3 else 'ghost',
+                    'group': 'group',
+                    'text': f'Пост {i}',
+                    'pub_date': f'2020-01-0{i + 1}T10:00:00+00:00',
+                }) + '\n')
+        self.path = source.name
+        self.addCleanup(os.remove, self.path)
+
+    def test_import_keeps_dates_and_skips_unknown_authors(self):
+        """Импорт сохраняет даты, пропускает неизвестных авторов."""
+        call_command('import_posts', self.path, chunk_size=2,
+                     stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 4)
+        self.assertEqual(
+            Post.objects.filter(group=self.group, author=self.author).count(),
+            4
+        )
+        oldest = Post.objects.order_by('pub_date').first()
+        self.assertEqual(oldest.pub_date.year, 2020)
+        self.assertEqual(self.author.post_counter.posts_count, 4)
+
+    def test_import_resumes_from_checkpoint(self):
+        """Повторный запуск не дублирует уже сохранённые записи."""
+        call_command('import_posts', self.path, chunk_size=2,
+                     stdout=StringIO())
+        with open(self.path, 'a') as source:
+            source.write(json.dumps({'author': 'author', 'text': 'Новый'}))
+        # загруженные строки не читаются заново: чтение идёт со смещения
+        loads = mock.Mock(wraps=json.loads)
+        with mock.patch(
+            'posts.management.commands.import_posts.json.loads', loads
+        ):
+            call_command('import_posts', self.path, chunk_size=2,
+                         stdout=StringIO())
+        self.assertEqual(loads.call_count, 1)
+        self.assertEqual(Post.objects.count(), 5)
+        checkpoint = ImportCheckpoint.objects.get()
+        self.assertEqual(checkpoint.position, 6)
+        self.assertEqual(checkpoint.offset, os.path.getsize(self.path))
+
+    def test_csv_resume_rereads_header(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.csv', delete=False, newline=''
+        ) as source:
+            source.write(f'post,author,text\r\n{post.pk},author,Первый\r\n')
+        self.addCleanup(os.remove, source.name)
+        call_command('import_posts', source.name, kind='comments',
+                     stdout=StringIO())
+        with open(source.name, 'a', newline='') as source_file:
+            source_file.write(
+                f'{post.pk},author,"Второй,\r\nс переносом"\r\n'
+            )
+        call_command('import_posts', source.name, kind='comments',
+                     stdout=StringIO())
+        self.assertEqual(
+            list(Comment.objects.order_by('pk').values_list(
+                'text', flat=True
+            )),
+            ['Первый', 'Второй,\r\nс переносом'],
+        )
+
+    def test_malformed_rows_are_skipped(self):
+        """Строки без текста или с кривым id не прерывают импорт."""
+        with open(self.path, 'a') as source:
+            for row in ({'author': 'author'},
+                        {'author': 'author', 'id': 'x', 'text': 'Кривой'},
+                        {'author': 'author', 'id': 700, 'text': 'Старый'}):
+                source.write(json.dumps(row) + '\n')
+        output = StringIO()
+        call_command('import_posts', self.path, stdout=output)
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertTrue(Post.objects.filter(pk=700, text='Старый').exists())
+        self.assertIn('пропущено 3', output.getvalue())
+
+        with open(self.path, 'a') as source:
+            source.write('{"author": "author", "text": "Обрыв\n[1, 2]\n')
+            source.write(json.dumps({'author': 'author', 'text': 'После'}))
+        output = StringIO()
+        call_command('import_posts', self.path, stdout=output)
+        self.assertTrue(Post.objects.filter(text='После').exists())
+        self.assertIn('импортировано 1, пропущено 2', output.getvalue())
+
+        comments = tempfile.NamedTemporaryFile(
+            'w', suffix='.csv', delete=False
+        )
+        with comments:
+            comments.write('post,author,text\n'
+                           '700,author,Ответ\n'
+                           'abc,author,Кривой\n'
+                           '700,author\n')
+        self.addCleanup(os.remove, comments.name)
+        output = StringIO()
+        call_command('import_posts', comments.name, kind='comments',
+                     stdout=output)
+        self.assertEqual(Comment.objects.get().post_id, 700)
+        self.assertIn('пропущено 2', output.getvalue())
+
+
+class ExportCommandTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {i}')
+            for i in range(3)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def export(self, *args, **options):
+        output = StringIO()
+        call_command('export_posts', *args, stdout=output, **options)
+        return output.getvalue()
+
+    def test_jsonl_export_by_id_range(self):
+        """Выгрузка идёт по id и продолжается с after_id."""
+        rows = [
+            json.loads(line) for line in self.export(
+                'posts', after_id=self.posts[0].pk, chunk_size=1
+            ).splitlines()
+        ]
+        self.assertEqual(
+            [row['id'] for row in rows], [post.pk for post in self.posts[1:]]
+        )
+        self.assertEqual(rows[0]['author'], 'author')
+        self.assertEqual(rows[0]['text'], 'Пост 1')
+
+    def test_csv_export(self):
+        """CSV выгрузка начинается с заголовка колонок."""
+        lines = self.export('follows', format='csv').splitlines()
+        self.assertEqual(lines, [
+            'id,user,author', f'{Follow.objects.get().pk},reader,author'
+        ])
+
+    def test_export_date_range(self):
+        """--since отсекает более ранние записи."""
+        self.assertEqual(self.export('comments', '--since=2999-01-01'), '')
+        self.assertEqual(len(self.export('comments').splitlines()), 1)
+
+    def test_export_roundtrip(self):
+        """Посты загружаются со старыми id, комментарии к ним привязаны."""
+        for kind in ('posts', 'comments'):
+            with tempfile.NamedTemporaryFile(
+                'w', suffix='.jsonl', delete=False
+            ) as dump:
+                dump.write(self.export(kind))
+            self.addCleanup(os.remove, dump.name)
+            if kind == 'posts':
+                posts = dump.name
+            else:
+                comments = dump.name
+        # повторная загрузка в ту же базу ничего не дублирует
+        call_command('import_posts', posts, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 3)
+        ids = [post.pk for post in self.posts]
+        Post.objects.all().delete()
+        call_command('import_posts', posts, restart=True, stdout=StringIO())
+        call_command('import_posts', comments, kind='comments',
+                     stdout=StringIO())
+        self.assertEqual(
+            sorted(Post.objects.values_list('pk', flat=True)), ids
+        )
+        self.assertEqual(Comment.objects.get().post_id, ids[0])
+
+    def test_admin_action_streams(self):
+        """Действие админки отдаёт StreamingHttpResponse."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        response = self.client.post(
+            reverse('admin:posts_comment_changelist'),
+            {'action': 'export_csv', '_selected_action': [
+                Comment.objects.get().pk
+            ]},
+        )
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('reader', content)
+
+
+class DedupeImagesCommandTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, THUMBNAIL_WORKERS=0
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        author = User.objects.create_user(username='author')
+        content = ContentFile(SMALL_GIF)
+        self.target = hashed_name('posts/a.gif', content_hash(content))
+        # картинки, загруженные до хранилища по содержимому
+        for name in ('posts/a.gif', 'posts/b.gif'):
+            default_storage.save(name, content)
+            Post.objects.create(author=author, text=name, image=name)
+
+    def test_duplicates_are_merged(self):
+        output = StringIO()
+        call_command('dedupe_images', stdout=output)
+        self.assertIn('слито дубликатов: 1', output.getvalue())
+        self.assertEqual(
+            set(Post.objects.values_list('image', flat=True)), {self.target}
+        )
+        self.assertTrue(default_storage.exists(self.target))
+        self.assertFalse(default_storage.exists('posts/a.gif'))
+        self.assertFalse(default_storage.exists('posts/b.gif'))
+        self.assertEqual(
+            list(StoredImage.objects.values_list('name', 'ref_count')),
+            [(self.target, 2)]
+        )
+
+    def test_dry_run_changes_nothing(self):
+        call_command('dedupe_images', '--dry-run', stdout=StringIO())
+        self.assertTrue(default_storage.exists('posts/a.gif'))
+        self.assertFalse(default_storage.exists(self.target))
+        self.assertFalse(Post.objects.filter(image=self.target).exists())
@@ -1,18 +1,40 @@
 import shutil
 import tempfile
+import threading
+from io import BytesIO
+from unittest import mock
 
 from django.conf import settings
-from django.test import Client, TestCase, override_settings
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
 from django.urls import reverse
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
 
-from posts.models import Group, Post, User
+from posts.models import Group, Post, StoredImage, User
+from posts.templatetags.post_images import responsive_image
 from posts.forms import PostForm
+from posts import thumbnails
+from posts.images import save_variants, variant_name
+from posts.tests.utils import run_on_commit
+from yatube.constants import IMAGE_MAX_SIDE, IMAGE_VARIANT_WIDTHS
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -54,11 +76,12 @@ class PostFormTests(TestCase):
             'text': 'Тестовый текст из формы',
             'image': uploaded,
         }
-        response = self.authorized_client.post(
-            reverse('posts:post_create'),
-            data=form_data,
-            follow=True
-        )
+        with run_on_commit():
+            response = self.authorized_client.post(
+                reverse('posts:post_create'),
+                data=form_data,
+                follow=True
+            )
         self.assertRedirects(response,
                              reverse('posts:profile',
                                      kwargs={'username': self.author}))
@@ -66,13 +89,17 @@ class PostFormTests(TestCase):
         self.assertTrue(Post.objects.filter(
             text='Тестовый текст из формы',
             group=self.group.id,
-            image='posts/small.gif',
+            # картинка перекодирована в JPEG, см. posts/images.py,
+            # и названа по хешу содержимого, см. posts/storage.py
+            image__regex=r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$',
         ).exists())
         post_request = self.authorized_client.get(reverse('posts:index'))
         first_object = post_request.context['page_obj'][0]
         self.assertEqual(first_object.text, 'Тестовый текст из формы')
         self.assertEqual(first_object.group.title, 'Тестовая группа')
-        self.assertEqual(first_object.image.name, 'posts/small.gif')
+        self.assertEqual(
+            first_object.image.name, Post.objects.get().image.name
+        )
 
     def test_post_edit_correct(self):
         self.post = Post.objects.create(
@@ -101,3 +128,218 @@ class PostFormTests(TestCase):
                 text=form_data['text'],
             ).exists()
         )
+
+    def edit(self, post, data, **kwargs):
+        with CaptureQueriesContext(connection) as context:
+            self.authorized_client.post(
+                reverse('posts:post_edit', args=[post.pk]), data=data,
+                **kwargs
+            )
+        return [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('UPDATE "posts_post"')
+        ]
+
+    def test_post_edit_writes_changed_fields_once(self):
+        """Правка — один UPDATE только изменённых полей."""
+        post = Post.objects.create(
+            author=self.author, text='Тестовый пост', group=self.group
+        )
+        with mock.patch('posts.signals.schedule_thumbnails') as thumbnails:
+            updates = self.edit(
+                post, {'text': 'Новый текст', 'group': self.group.pk}
+            )
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"text"', updates[0])
+        self.assertNotIn('"group_id"', updates[0])
+        self.assertNotIn('"image"', updates[0])
+        thumbnails.assert_not_called()
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Новый текст')
+
+    def test_post_edit_without_changes_skips_write(self):
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        self.assertEqual(self.edit(post, {'text': 'Тестовый пост'}), [])
+
+    def test_post_edit_new_image_prepares_thumbnails(self):
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        image = SimpleUploadedFile(
+            name='edit.gif', content=SMALL_GIF, content_type='image/gif'
+        )
+        with mock.patch('posts.signals.schedule_thumbnails') as thumbnails:
+            updates = self.edit(
+                post, {'text': 'Тестовый пост', 'image': image}
+            )
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"image"', updates[0])
+        thumbnails.assert_called_once()
+
+
+def make_photo(size, exif=True):
+    """JPEG «с телефона»: с EXIF и поворотом."""
+    buffer = BytesIO()
+    image = Image.new('RGB', size, (200, 30, 30))
+    info = Image.Exif()
+    if exif:
+        info[0x0112] = 6  # Orientation: повернуть на 90°
+        info[0x010F] = 'PhoneMaker'
+    image.save(buffer, 'JPEG', exif=info.tobytes())
+    return SimpleUploadedFile(
+        'photo.jpg', buffer.getvalue(), content_type='image/jpeg'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ImageIngestionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='photographer')
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    def create(self, image):
+        return self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'Фото', 'image': image},
+        )
+
+    def test_photo_is_reencoded_and_has_variants(self):
+        """Картинка уменьшена, без EXIF, с вариантами для srcset."""
+        with run_on_commit():
+            self.create(make_photo((2400, 1600)))
+        post = Post.objects.get()
+        self.assertEqual(
+            (post.image_width, post.image_height), (IMAGE_MAX_SIDE * 2 // 3,
+                                                    IMAGE_MAX_SIDE)
+        )
+        with default_storage.open(post.image.name) as stored:
+            image = Image.open(stored)
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(dict(image.getexif()), {})
+        for width in IMAGE_VARIANT_WIDTHS:
+            self.assertTrue(
+                default_storage.exists(variant_name(post.image.name, width))
+            )
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'srcset=')
+        self.assertContains(response, f'{IMAGE_VARIANT_WIDTHS[0]}w')
+
+    def test_variants_are_made_after_commit(self):
+        """До коммита вариантов нет, и шаблон показывает исходник."""
+        # другой размер — другой файл, чем в соседних тестах
+        with run_on_commit():
+            self.create(make_photo((2400, 1500)))
+            post = Post.objects.get()
+            self.assertFalse(default_storage.exists(
+                variant_name(post.image.name, IMAGE_VARIANT_WIDTHS[0])
+            ))
+            self.assertIsNone(responsive_image(post))
+        self.assertIn('srcset', responsive_image(post))
+        size = (post.image_width, post.image_height)
+        with mock.patch('posts.images.Image.open') as image_open:
+            self.assertEqual(save_variants(post.image.name, size), size)
+        image_open.assert_not_called()
+
+    def test_too_many_pixels(self):
+        with mock.patch('posts.images.IMAGE_MAX_PIXELS', 100):
+            response = self.create(make_photo((20, 20), exif=False))
+        self.assertFormError(
+            response, 'form', 'image',
+            'Слишком большое изображение: 20×20.'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    def test_oversized_upload_is_cut_off(self):
+        """Файл больше предела не дочитывается и не разбирается."""
+        limit = 1024
+        with mock.patch('posts.uploads.IMAGE_MAX_UPLOAD_SIZE', limit), \
+                mock.patch('posts.images.IMAGE_MAX_UPLOAD_SIZE', limit), \
+                mock.patch('posts.images.Image.open') as image_open:
+            response = self.create(SimpleUploadedFile(
+                'big.jpg', b'x' * (limit * 4), content_type='image/jpeg'
+            ))
+        image_open.assert_not_called()
+        self.assertFormError(
+            response, 'form', 'image', 'Файл больше 1,0\xa0КБ.'
+        )
+        self.assertFalse(Post.objects.exists())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ImageStorageTests(TransactionTestCase):
+    """Одинаковые картинки хранятся одним файлом со счётчиком ссылок."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='reposter')
+        self.client.force_login(self.author)
+
+    def create(self):
+        self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'Репост', 'image': make_photo((800, 600))},
+        )
+        return Post.objects.latest('pk')
+
+    def test_duplicates_share_file_until_last_reference(self):
+        first, second = self.create(), self.create()
+        name = first.image.name
+        self.assertEqual(second.image.name, name)
+        self.assertEqual(StoredImage.objects.get(name=name).ref_count, 2)
+        variant = variant_name(name, IMAGE_VARIANT_WIDTHS[0])
+
+        first.delete()
+        self.assertEqual(StoredImage.objects.get(name=name).ref_count, 1)
+        self.assertTrue(default_storage.exists(name))
+
+        second.delete()
+        self.assertFalse(StoredImage.objects.filter(name=name).exists())
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(default_storage.exists(variant))
+
+    def test_replaced_image_is_released(self):
+        post = self.create()
+        old = post.image.name
+        post.image = SimpleUploadedFile('small.gif', SMALL_GIF)
+        post.save(update_fields=['image'])
+        self.assertNotEqual(post.image.name, old)
+        self.assertFalse(StoredImage.objects.filter(name=old).exists())
+        self.assertFalse(default_storage.exists(old))
+        self.assertEqual(
+            StoredImage.objects.get(name=post.image.name).ref_count, 1
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=1)
+class ThumbnailWorkerTests(TransactionTestCase):
+    """Фоновая задача по готовности вариантов сбрасывает ленты."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='worker')
+        self.client.force_login(self.author)
+        self.addCleanup(setattr, thumbnails, '_executor', None)
+
+    def test_feed_changes_when_variants_are_ready(self):
+        ready = threading.Event()
+        prepare_image = thumbnails.prepare_image
+
+        def wait_then_prepare(*args):
+            ready.wait(5)
+            prepare_image(*args)
+
+        with mock.patch('posts.thumbnails.prepare_image', wait_then_prepare):
+            self.client.post(
+                reverse('posts:post_create'),
+                {'text': 'Фото', 'image': make_photo((2000, 1200))},
+            )
+            before = self.client.get(reverse('posts:index'))
+            self.assertNotContains(before, 'srcset=')
+            ready.set()
+            thumbnails._executor.shutdown(wait=True)
+        after = self.client.get(
+            reverse('posts:index'), HTTP_IF_NONE_MATCH=before['ETag']
+        )
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after['ETag'], before['ETag'])
+        self.assertContains(after, 'srcset=')
@@ -1,7 +1,18 @@
-from django.test import TestCase
+import threading
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 from mixer.backend.django import mixer
 
-from ..models import Group, Post, User
+from yatube.constants import POST_EXCERPT_LENGTH
+
+from ..models import Comment, Group, Post, PostCounter, User
+from .utils import run_on_commit
 
 
 class PostModelTest(TestCase):
@@ -53,3 +64,199 @@ class GroupeModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     str(field), expected_value)
+
+
+class PostCounterTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='counter')
+
+    def test_counter_follows_create_and_delete(self):
+        """Счётчик постов меняется при создании и удалении поста."""
+        posts = [
+            Post.objects.create(author=self.user, text=f'пост {i}')
+            for i in range(3)
+        ]
+        posts[0].delete()
+        self.assertEqual(
+            PostCounter.objects.get(author=self.user).posts_count, 2)
+
+    def test_author_cascade_delete(self):
+        author = User.objects.create_user(username='removed')
+        Post.objects.create(author=author, text='пост')
+        author.delete()
+        self.assertFalse(PostCounter.objects.filter(pk=author.pk).exists())
+
+    def test_recount_repairs_drift(self):
+        Post.objects.create(author=self.user, text='пост')
+        PostCounter.objects.filter(author=self.user).update(posts_count=10)
+        call_command('recount', stdout=StringIO())
+        self.assertEqual(
+            PostCounter.objects.get(author=self.user).posts_count, 1)
+
+
+class CommentCountTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        self.post = Post.objects.create(author=self.author, text='пост')
+
+    def comment_count(self):
+        self.post.refresh_from_db(fields=['comment_count'])
+        return self.post.comment_count
+
+    def test_count_follows_create_and_delete(self):
+        """Счётчик комментариев меняется при добавлении и удалении."""
+        comments = [
+            Comment.objects.create(
+                post=self.post, author=self.reader, text=f'комментарий {i}'
+            )
+            for i in range(3)
+        ]
+        self.assertEqual(self.comment_count(), 3)
+        comments[0].delete()
+        self.assertEqual(self.comment_count(), 2)
+
+    def test_commenter_cascade_delete(self):
+        """Удаление автора комментариев уменьшает счётчик поста."""
+        commenter = User.objects.create_user(username='commenter')
+        Comment.objects.create(post=self.post, author=commenter, text='к')
+        Comment.objects.create(post=self.post, author=self.reader, text='к')
+        commenter.delete()
+        self.assertEqual(self.comment_count(), 1)
+
+    def test_post_delete_skips_per_comment_writes(self):
+        """Каскад комментариев не пишет в счётчик удаляемого поста,
+        а версии лент меняются один раз за транзакцию."""
+        for i in range(20):
+            Comment.objects.create(post=self.post, author=self.reader,
+                                   text=f'к {i}')
+        with mock.patch('posts.caching._bump') as bump, \
+                CaptureQueriesContext(connection) as context, \
+                run_on_commit():
+            self.post.delete()
+        updates = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('UPDATE "posts_post"')
+        ]
+        self.assertEqual(updates, [])
+        bump.assert_called_once()
+        self.assertFalse(Comment.objects.exists())
+
+    def test_failed_post_delete_keeps_comment_counts(self):
+        """Удаление поста упало — его комментарии считаются как раньше."""
+        comments = [
+            Comment.objects.create(post=self.post, author=self.reader,
+                                   text=f'к {i}')
+            for i in range(2)
+        ]
+        delete_batch = mock.patch(
+            'django.db.models.sql.subqueries.DeleteQuery.delete_batch',
+            side_effect=DatabaseError,
+        )
+        with self.assertRaises(DatabaseError), transaction.atomic(), \
+                delete_batch:
+            self.post.delete()
+        comments[0].delete()
+        self.assertEqual(self.comment_count(), 1)
+
+    def test_recount_repairs_comment_drift(self):
+        Comment.objects.create(post=self.post, author=self.reader, text='к')
+        Post.objects.filter(pk=self.post.pk).update(comment_count=7)
+        call_command('recount', stdout=StringIO())
+        self.assertEqual(self.comment_count(), 1)
+
+
+class PostRenderingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='writer')
+
+    def test_html_is_rendered_on_save(self):
+        post = Post.objects.create(author=self.user, text='<b>раз</b>\nдва')
+        self.assertEqual(
+            post.text_html, '&lt;b&gt;раз&lt;/b&gt;<br>два'
+        )
+        self.assertEqual(post.excerpt_html, post.text_html)
+        self.assertFalse(post.is_truncated)
+
+        post.text = 'слово ' * POST_EXCERPT_LENGTH
+        post.save(update_fields=['text'])
+        post.refresh_from_db()
+        self.assertLess(len(post.excerpt_html), len(post.text_html))
+        self.assertTrue(post.is_truncated)
+
+    def test_feed_uses_excerpt(self):
+        with run_on_commit():
+            Post.objects.create(author=self.user, text='а' * 1000)
+        response = Client().get(reverse('posts:index'))
+        self.assertNotContains(response, 'а' * 1000)
+        self.assertContains(response, 'читать полностью')
+
+    def test_render_posts_backfills(self):
+        post = Post.objects.create(author=self.user, text='один\nдва')
+        Post.objects.update(text_html='', excerpt_html='')
+        call_command('render_posts', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.text_html, 'один<br>два')
+        self.assertEqual(post.excerpt_html, 'один<br>два')
+
+
+class PostCounterAtomicTest(TransactionTestCase):
+    def test_failed_signal_rolls_back_post(self):
+        """Пост и счётчик постов автора пишутся одной транзакцией."""
+        author = User.objects.create_user(username='author')
+        with mock.patch('posts.signals.increment_posts_count',
+                        side_effect=DatabaseError), \
+                self.assertRaises(DatabaseError):
+            Post.objects.create(author=author, text='пост')
+        self.assertFalse(Post.objects.exists())
+        Post.objects.create(author=author, text='пост')
+        self.assertEqual(
+            PostCounter.objects.get(author=author).posts_count, 1
+        )
+
+
+class ConcurrentCommentCountTest(TransactionTestCase):
+    """Параллельные add_comment не теряют приращений счётчика."""
+    THREADS = 8
+
+    def test_parallel_add_comment(self):
+        author = User.objects.create_user(username='author')
+        post = Post.objects.create(author=author, text='пост')
+        readers = [
+            User.objects.create_user(username=f'reader{i}')
+            for i in range(self.THREADS)
+        ]
+        url = reverse('posts:add_comment', args=[post.pk])
+        barrier = threading.Barrier(self.THREADS)
+        errors = []
+
+        def comment(client, reader):
+            try:
+                barrier.wait(timeout=10)
+                client.post(url, {'text': f'от {reader.username}'})
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = []
+        for reader in readers:
+            client = Client()
+            client.force_login(reader)
+            threads.append(
+                threading.Thread(target=comment, args=(client, reader))
+            )
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=30)
+        self.assertEqual(errors, [])
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, self.THREADS)
+        self.assertEqual(post.comments.count(), self.THREADS)
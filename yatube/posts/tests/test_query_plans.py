@@ -0,0 +1,73 @@
+import re
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+# Строка плана без индекса: «SCAN posts_post» или «SCAN TABLE posts_post».
+TABLE_SCAN = re.compile(r'^SCAN (TABLE )?posts_\w+( AS \w+)?$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN есть в SQLite')
+class FeedQueryPlanTest(TestCase):
+    """Запросы лент идут по индексам: без полного скана и сортировки."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='plan-group', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(15):
+            cls.post = Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}'
+            )
+        Comment.objects.create(post=cls.post, author=cls.reader, text='Да')
+
+    def setUp(self):
+        # версии лент меняются после коммита, а TestCase не коммитит:
+        # фрагменты из других тестов не должны попасть в этот
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def assert_indexed(self, url, params=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or 'posts_' not in sql:
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                for *_, detail in cursor.fetchall():
+                    with self.subTest(url=url, sql=sql, plan=detail):
+                        self.assertNotIn(TEMP_SORT, detail)
+                        self.assertIsNone(TABLE_SCAN.match(detail))
+        return response
+
+    def test_feeds_use_indexes(self):
+        feeds = (
+            reverse('posts:index'),
+            reverse('posts:group', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:follow_index'),
+        )
+        for url in feeds:
+            page_obj = self.assert_indexed(url).context['page_obj']
+            self.assert_indexed(url, {'page': 2})
+            self.assert_indexed(url, {'after': page_obj.next_cursor})
+
+    def test_post_detail_uses_indexes(self):
+        self.assert_indexed(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
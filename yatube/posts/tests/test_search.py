@@ -0,0 +1,87 @@
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from yatube.constants import POSTS_PER_STR
+
+from ..models import Group, Post, User
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Группа', slug='search-group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group,
+                text=f'Кузнец ковал подкову номер {i}'
+            )
+            for i in range(POSTS_PER_STR + 3)
+        ]
+        cls.other_post = Post.objects.create(
+            author=cls.other, text='Кузнец в другой группе'
+        )
+        cls.unrelated = Post.objects.create(
+            author=cls.other, text='Про погоду'
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def search(self, **params):
+        return self.client.get(reverse('posts:search'), params)
+
+    def test_search_finds_posts(self):
+        """Поиск находит посты по словам и не находит лишних."""
+        response = self.search(q='кузнец')
+        found = response.context['page_obj'].object_list
+        self.assertEqual(len(found), POSTS_PER_STR)
+        self.assertNotIn(self.unrelated, found)
+
+    def test_search_keyset_pages(self):
+        first = self.search(q='кузнец').context['page_obj']
+        second = self.search(
+            q='кузнец', after=first.next_cursor).context['page_obj']
+        self.assertEqual(len(second.object_list), 4)
+        self.assertFalse(set(first) & set(second))
+        back = self.search(
+            q='кузнец', before=second.previous_cursor).context['page_obj']
+        self.assertEqual(back.object_list, first.object_list)
+        # оба курсора: как в лентах, берётся after
+        both = self.search(
+            q='кузнец', after=first.next_cursor,
+            before=second.previous_cursor,
+        ).context['page_obj']
+        self.assertEqual(both.object_list, second.object_list)
+
+    def test_search_filters(self):
+        response = self.search(q='кузнец', author=self.other.username)
+        self.assertEqual(
+            response.context['page_obj'].object_list, [self.other_post])
+        response = self.search(q='группе', group=self.group.slug)
+        self.assertEqual(len(response.context['page_obj'].object_list), 0)
+
+    def test_index_follows_edits(self):
+        """Изменение и удаление поста попадают в индекс."""
+        self.unrelated.text = 'Про кузнечиков'
+        self.unrelated.save()
+        self.assertIn(
+            self.unrelated,
+            self.search(q='кузнечиков').context['page_obj'].object_list
+        )
+        self.unrelated.delete()
+        self.assertEqual(
+            len(self.search(q='кузнечиков').context['page_obj']), 0)
+
+    def test_admin_uses_index(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@yatube.ru', 'password')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'погоду'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.unrelated])
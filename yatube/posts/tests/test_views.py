@@ -1,3 +1,5 @@
+import warnings
+from io import StringIO
 import shutil
 import tempfile
 import random
@@ -9,12 +11,23 @@ from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
 
-from yatube.constants import POSTS_PER_STR
+from yatube.constants import COMMENTS_PER_PAGE, POSTS_PER_STR
 
-from ..models import Group, Post, User, Comment, Follow
+from ..models import Group, Post, User, Comment, Follow, FeedItem
+from ..follows import get_following_ids
+from ..thumbnails import generate_thumbnails
+from ..utils import CachedCountPaginator
+from .utils import query_budget, run_on_commit
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+# файл назван по sha256 содержимого, см. posts/storage.py
+IMAGE_NAME = ('posts/c8/c8b24ca8dcbfc94990deafdb184f07dc'
+              'ed6cb8be3f70ac6562ba36d5d14b06a5.gif')
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -71,6 +84,7 @@ class PostMainViewTests(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.user = User.objects.create_user(username='HasNoName')
         self.authorized_client = Client()
@@ -113,7 +127,7 @@ class PostMainViewTests(TestCase):
         self.assertEqual(post_text_0, 'Тестовый пост')
         self.assertEqual(post_group_0, 'Тестовая группа')
         self.assertEqual(post_author_0, 'FirstAuthor')
-        self.assertEqual(post_image_0, 'posts/small.gif')
+        self.assertEqual(post_image_0, IMAGE_NAME)
 
     def test_group_page_show_correct_context(self):
         """Проверка отображения на странице группы"""
@@ -125,7 +139,7 @@ class PostMainViewTests(TestCase):
         post_text_0 = first_object.text
         post_group_0 = first_object.group.title
         post_author_0 = first_object.author.username
-        self.assertEqual(post_image_0, 'posts/small.gif')
+        self.assertEqual(post_image_0, IMAGE_NAME)
     
     def test_post_on_author_page(self):
         """Проверка отображения нового поста на странице автора"""
@@ -137,7 +151,7 @@ class PostMainViewTests(TestCase):
         post_text_0 = first_object.text
         post_group_0 = first_object.group.title
         post_author_0 = first_object.author.username
-        self.assertEqual(post_image_0, 'posts/small.gif')
+        self.assertEqual(post_image_0, IMAGE_NAME)
     
 
     def test_post_detail_pages_show_correct_context(self):
@@ -147,7 +161,7 @@ class PostMainViewTests(TestCase):
         self.assertEqual(response.context.get('post').group.title,
                          'Тестовая группа')
         self.assertEqual(response.context.get('post').text, 'Тестовый пост')
-        self.assertEqual(response.context.get('post').image, 'posts/small.gif')
+        self.assertEqual(response.context.get('post').image, IMAGE_NAME)
 
     def test_context_in_profile(self):
         """Шаблон post_profile сформирован с правильным контекстом."""
@@ -156,7 +170,7 @@ class PostMainViewTests(TestCase):
         self.assertEqual(response.context.get('post').group.title,
                          'Тестовая группа')
         self.assertEqual(response.context.get('post').text, 'Тестовый пост')
-        self.assertEqual(response.context.get('post').image, 'posts/small.gif')
+        self.assertEqual(response.context.get('post').image, IMAGE_NAME)
 
     def test_create_post__page_show_correct_context(self):
         """Шаблон create_post сформирован с правильным контекстом."""
@@ -175,6 +189,16 @@ class PostMainViewTests(TestCase):
                 form_field = response.context['form'].fields[value]
                 self.assertIsInstance(form_field, expected)
 
+    def test_thumbnail_is_prebuilt_not_on_request(self):
+        """Страница не создаёт миниатюру, а берёт готовую."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        response = self.guest_client.get(url)
+        self.assertContains(response, self.post.image.url)
+        self.assertNotContains(response, 'cache/')
+        generate_thumbnails(self.post.image.name)
+        response = self.guest_client.get(url)
+        self.assertContains(response, 'cache/')
+
     def test_add_comment_correct(self):
         """Комментировать посты может только авторизованный пользователь."""
         form_data = {'text': 'test_add_comment_correct', }
@@ -238,6 +262,7 @@ class CacheIndexPageTest(TestCase):
         )
     
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.author)
 
@@ -246,7 +271,10 @@ class CacheIndexPageTest(TestCase):
 
         # проверим, что пост есть
         response_1 = self.authorized_client.get(reverse('posts:index'))
-        Post.objects.all().delete()
+        # update() не шлёт сигналов, версия ленты не меняется;
+        # лента показывает готовый HTML, поэтому меняем и его
+        Post.objects.update(text='Изменён в обход сигналов',
+                            excerpt_html='Изменён в обход сигналов')
         response_2 = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(
             response_1.content,
@@ -259,6 +287,24 @@ class CacheIndexPageTest(TestCase):
             response_2.content
         )
 
+    def test_write_invalidates_index_cache(self):
+        """Удаление поста сразу сбрасывает кеш ленты."""
+        response_1 = self.authorized_client.get(reverse('posts:index'))
+        with run_on_commit():
+            Post.objects.all().delete()
+        response_2 = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response_1, self.post.text)
+        self.assertNotContains(response_2, self.post.text)
+
+    def test_cache_is_viewer_safe(self):
+        """Гость не получает фрагмент, закешированный для пользователя,
+        а лента подписок не совпадает с главной."""
+        self.authorized_client.get(reverse('posts:index'))
+        response = Client().get(reverse('posts:index'))
+        self.assertNotContains(response, reverse('posts:follow_index'))
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertNotContains(response, self.post.text)
+
 
 class PostViewTests(TestCase):
     @classmethod
@@ -363,6 +409,56 @@ class paginatorViewsTest(TestCase):
             reverse('posts:index') + '?page=2')
         self.assertEqual(len(response.context.get('page_obj').object_list), 5)
 
+    def test_count_is_cached_until_write(self):
+        """COUNT(*) ленты берётся из кеша, пока посты не меняются."""
+        cache.clear()
+        url = reverse('posts:index') + '?page=2'
+        with CaptureQueriesContext(connection) as first:
+            self.authorized_client.get(url)
+        with CaptureQueriesContext(connection) as second:
+            response = self.authorized_client.get(url)
+        self.assertEqual(
+            len(second.captured_queries), len(first.captured_queries) - 1)
+        self.assertEqual(response.context['page_obj'].paginator.count, 15)
+        with run_on_commit():
+            Post.objects.create(text='Ещё один пост', author=self.user)
+        response = self.authorized_client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 16)
+
+    def test_page_window_is_bounded(self):
+        paginator = CachedCountPaginator(range(1000), POSTS_PER_STR)
+        self.assertEqual(
+            paginator.page(50).page_window,
+            [1, None, 48, 49, 50, 51, 52, None, 100]
+        )
+        self.assertEqual(paginator.page(1).page_window,
+                         [1, 2, 3, None, 100])
+
+    def test_cursor_pages(self):
+        """Курсоры ?after=/?before= ведут на соседние страницы."""
+        first_page = self.authorized_client.get(
+            reverse('posts:index')).context['page_obj']
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'after': first_page.next_cursor})
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj.object_list), 5)
+        self.assertFalse(page_obj.has_next())
+        self.assertTrue(page_obj.has_previous())
+        self.assertNotContains(response, '?page=2')
+
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'before': page_obj.previous_cursor})
+        self.assertEqual(
+            response.context['page_obj'].object_list,
+            first_page.object_list
+        )
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_broken_cursor_opens_first_page(self):
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'after': 'broken'})
+        self.assertEqual(response.context['page_obj'].number, 1)
+
 
 class FollowTest(TestCase):
     @classmethod
@@ -382,6 +478,10 @@ class FollowTest(TestCase):
             text='текст'
         )
 
+    def setUp(self):
+        # множество подписок живёт в кеше дольше транзакции теста
+        cache.clear()
+
     def test_user_can_following(self):
         """Авторизованный пользователь может
         подписаться на другого пользователя"""
@@ -400,4 +500,343 @@ class FollowTest(TestCase):
         self.follower_user.get(reverse(
             'posts:profile_unfollow',
             kwargs={'username': self.author.username}))
-        self.assertEqual(Follow.objects.count(), count - 1)
\ No newline at end of file
+        self.assertEqual(Follow.objects.count(), count - 1)
+
+    def test_follow_feed(self):
+        """Лента подписок собирается при подписке и новых постах
+        и очищается при отписке."""
+        self.follower_user.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.author.username}))
+        new_post = Post.objects.create(author=self.author, text='новый')
+        response = self.follower_user.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            response.context['page_obj'].object_list,
+            [new_post, self.post]
+        )
+        self.follower_user.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}))
+        response = self.follower_user.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj'].object_list), 0)
+
+    def test_profile_shows_follow_state(self):
+        """Кнопка на профиле отражает подписку и сбрасывается отпиской."""
+        url = reverse('posts:profile', args=[self.author.username])
+        self.assertFalse(self.follower_user.get(url).context['following'])
+        self.follower_user.get(reverse(
+            'posts:profile_follow', args=[self.author.username]))
+        response = self.follower_user.get(url)
+        self.assertTrue(response.context['following'])
+        self.assertContains(response, reverse(
+            'posts:profile_unfollow', args=[self.author.username]))
+        self.follower_user.get(reverse(
+            'posts:profile_unfollow', args=[self.author.username]))
+        self.assertFalse(self.follower_user.get(url).context['following'])
+
+    def test_following_ids_one_query(self):
+        """Подписки читателя — один запрос, затем кеш."""
+        authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(5)
+        ]
+        Follow.objects.bulk_create(
+            Follow(user=self.follower, author=author) for author in authors
+        )
+        with self.assertNumQueries(1):
+            following = get_following_ids(self.follower.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_following_ids(self.follower.pk), {
+                author.pk for author in authors
+            })
+        self.assertNotIn(self.author.pk, following)
+
+    def test_backfill_feed(self):
+        Follow.objects.create(user=self.follower, author=self.author)
+        FeedItem.objects.all().delete()
+        call_command('backfill_feed', stdout=StringIO())
+        self.assertTrue(FeedItem.objects.filter(
+            user=self.follower, post=self.post).exists())
+
+
+class QueryBudgetTest(TestCase):
+    """Число запросов страниц не зависит от числа постов на странице."""
+    # сессия и пользователь — ещё два запроса в каждом бюджете,
+    # у post_detail ещё запрос валидаторов ETag/Last-Modified,
+    # у profile — подписки читателя и отдельно счётчик постов автора
+    # (кеш перед запросом очищен)
+    BUDGETS = {
+        'posts:index': 4,
+        'posts:group': 5,
+        'posts:profile': 7,
+        'posts:post_detail': 5,
+        'posts:post_comments': 5,
+        'posts:follow_index': 4,
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='budget-group', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Первый пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def urls(self):
+        return {
+            'posts:index': reverse('posts:index'),
+            'posts:group': reverse('posts:group', args=[self.group.slug]),
+            'posts:profile': reverse(
+                'posts:profile', args=[self.author.username]),
+            'posts:post_detail': reverse(
+                'posts:post_detail', args=[self.post.pk]),
+            'posts:post_comments': reverse(
+                'posts:post_comments', args=[self.post.pk]),
+            'posts:follow_index': reverse('posts:follow_index'),
+        }
+
+    def fill_page(self):
+        for i in range(POSTS_PER_STR * 2):
+            Post.objects.create(
+                author=self.author,
+                group=Group.objects.create(
+                    title=f'Группа {i}', slug=f'group-{i}',
+                    description='Описание'),
+                text=f'Пост {i}',
+            )
+            Comment.objects.create(
+                post=self.post,
+                author=User.objects.create_user(username=f'user{i}'),
+                text=f'Комментарий {i}',
+            )
+
+    def test_views_fit_query_budget(self):
+        for fill in (False, True):
+            if fill:
+                self.fill_page()
+            for name, url in self.urls().items():
+                cache.clear()
+                with self.subTest(view=name, full_page=fill):
+                    with query_budget(self, self.BUDGETS[name]):
+                        self.client.get(url)
+
+
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.author, text=f'Комментарий {i}')
+            for i in range(COMMENTS_PER_PAGE + 5)
+        )
+
+    def test_comments_are_paginated_oldest_first(self):
+        """post_detail показывает первую страницу комментариев."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_PER_PAGE)
+        self.assertEqual(comments[0].text, 'Комментарий 0')
+        self.assertIsNotNone(comments.next_cursor)
+        self.assertContains(response, reverse(
+            'posts:post_comments', args=[self.post.pk]
+        ))
+
+    def test_fragment_loads_next_comments(self):
+        """Фрагмент отдаёт следующие комментарии без страницы поста."""
+        first = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        ).context['comments']
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk]),
+            {'after': first.next_cursor},
+        )
+        self.assertTemplateUsed(
+            response, 'posts/includes/comment_list.html'
+        )
+        self.assertTemplateNotUsed(response, 'posts/post_detail.html')
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            [f'Комментарий {i}' for i in range(
+                COMMENTS_PER_PAGE, COMMENTS_PER_PAGE + 5)],
+        )
+        self.assertIsNone(comments.next_cursor)
+
+    def test_fragment_for_missing_post(self):
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk + 100])
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class LookupCacheTest(TestCase):
+    """slug и username из URL разрешаются через кеш."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Группа', slug='cached', description='Описание'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def lookup_queries(self, url, table):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        return response, [
+            query['sql'] for query in context.captured_queries
+            if f'FROM "{table}" WHERE' in query['sql']
+            and 'LIMIT 1' in query['sql']
+        ]
+
+    def test_warm_lookup_needs_no_query(self):
+        for url, table in (
+            (reverse('posts:group', args=['cached']), 'posts_group'),
+            (reverse('posts:profile', args=['author']), 'auth_user'),
+        ):
+            with self.subTest(url=url):
+                self.client.get(url)
+                response, queries = self.lookup_queries(url, table)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(queries, [])
+
+    def test_keys_are_memcached_safe(self):
+        """Пробелы и кириллица из запроса не попадают в ключ кеша."""
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+            response = self.client.get(
+                reverse('posts:search'),
+                {'q': 'пост', 'group': 'Группа с пробелом',
+                 'author': 'Лев Толстой'},
+            )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_missing_slug_is_cached(self):
+        url = reverse('posts:group', args=['missing'])
+        response, queries = self.lookup_queries(url, 'posts_group')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertEqual(len(queries), 1)
+        response, queries = self.lookup_queries(url, 'posts_group')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertEqual(queries, [])
+        Group.objects.create(title='Новая', slug='missing')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_changes_invalidate_lookup(self):
+        """Смена slug и имени автора сразу видна на страницах."""
+        self.client.get(reverse('posts:group', args=['cached']))
+        self.client.get(reverse('posts:profile', args=['author']))
+        self.group.slug = 'renamed'
+        self.group.save()
+        self.assertEqual(self.client.get(
+            reverse('posts:group', args=['cached'])
+        ).status_code, HTTPStatus.NOT_FOUND)
+        self.assertEqual(self.client.get(
+            reverse('posts:group', args=['renamed'])
+        ).context['group'].description, 'Описание')
+        self.author.first_name = 'Алексей'
+        self.author.save()
+        response = self.client.get(reverse('posts:profile', args=['author']))
+        self.assertContains(response, 'Алексей Толстой')
+
+
+class ConditionalGetTest(TestCase):
+    """Повторные запросы без изменений получают 304 без рендера."""
+    REPEATS = 5
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='etag-group', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def urls(self):
+        return (
+            reverse('posts:index'),
+            reverse('posts:group', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:follow_index'),
+        )
+
+    def revisit(self, url, first):
+        """Сколько из REPEATS повторных запросов обошлись без рендера."""
+        served = 0
+        for _ in range(self.REPEATS):
+            response = self.client.get(
+                url, HTTP_IF_NONE_MATCH=first['ETag'])
+            if response.status_code == HTTPStatus.NOT_MODIFIED:
+                self.assertEqual(response.templates, [])
+                served += 1
+        return served
+
+    def test_repeat_visits_are_not_rendered(self):
+        for url in self.urls():
+            with self.subTest(url=url):
+                # первый ответ ставит cookie csrftoken, она входит в ETag
+                self.client.get(url)
+                first = self.client.get(url)
+                self.assertEqual(self.revisit(url, first), self.REPEATS)
+
+    def test_writes_change_validators(self):
+        urls = self.urls()
+        for url in urls:
+            self.client.get(url)
+        first = {url: self.client.get(url) for url in urls}
+        with run_on_commit():
+            Comment.objects.create(
+                post=self.post, author=self.reader, text='!'
+            )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.revisit(url, first[url]), 0)
+
+    def test_author_rename_changes_validators(self):
+        """Новое имя автора видно сразу: ETag и фрагменты лент сброшены."""
+        urls = self.urls()
+        for url in urls:
+            self.client.get(url)
+        first = {url: self.client.get(url) for url in urls}
+        self.author.first_name = 'Лев'
+        self.author.last_name = 'Толстой'
+        with run_on_commit():
+            self.author.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.revisit(url, first[url]), 0)
+        self.assertContains(
+            self.client.get(reverse('posts:index')), 'Лев Толстой'
+        )
+
+    def test_etag_differs_per_viewer(self):
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        response = Client().get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
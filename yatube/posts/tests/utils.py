@@ -0,0 +1,40 @@
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@contextmanager
+def query_budget(test_case, budget):
+    """Проверяет, что блок сделал не больше budget SQL-запросов.
+
+        with query_budget(self, 6):
+            self.client.get(url)
+    """
+    with CaptureQueriesContext(connection) as context:
+        yield context
+    executed = len(context.captured_queries)
+    test_case.assertLessEqual(
+        executed, budget,
+        f'{executed} запросов при бюджете {budget}:\n' + '\n'.join(
+            query['sql'] for query in context.captured_queries
+        )
+    )
+
+
+@contextmanager
+def run_on_commit():
+    """Выполняет on_commit-колбэки, зарегистрированные в блоке.
+
+    TestCase не коммитит транзакцию, и без этого колбэки (например,
+    смена версий лент, posts/caching.py) не выполнились бы вовсе.
+    Колбэки, которые регистрируют сами колбэки, тоже выполняются: после
+    настоящего коммита они шли бы сразу.
+    """
+    start = len(connection.run_on_commit)
+    yield
+    while len(connection.run_on_commit) > start:
+        callbacks = connection.run_on_commit[start:]
+        del connection.run_on_commit[start:]
+        for _, callback in callbacks:
+            callback()
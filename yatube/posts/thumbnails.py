@@ -0,0 +1,103 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from core.instrumentation import timed
+from yatube.constants import THUMBNAIL_GEOMETRIES
+
+from .caching import bump_feed_versions
+from .images import save_variants
+from .storage import image_storage
+
+_executor = None
+
+
+class PrebuiltThumbnailBackend(ThumbnailBackend):
+    """Ищет готовую миниатюру в kvstore и никогда её не создаёт."""
+
+    def get_prebuilt(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+prebuilt_backend = PrebuiltThumbnailBackend()
+
+
+def get_prebuilt_thumbnail(image, geometry):
+    """Готовая миниатюра или None, если её ещё не сделали."""
+    return prebuilt_backend.get_prebuilt(
+        image, geometry, **THUMBNAIL_GEOMETRIES[geometry]
+    )
+
+
+def generate_thumbnails(name):
+    """Создаёт миниатюры всех размеров из THUMBNAIL_GEOMETRIES."""
+    # ключ миниатюры в kvstore зависит от хранилища исходника:
+    # то же, что у post.image, иначе шаблон её не найдёт
+    source = ImageFile(name, image_storage)
+    with timed('thumbnail'):
+        for geometry, options in THUMBNAIL_GEOMETRIES.items():
+            get_thumbnail(source, geometry, **options)
+
+
+def prepare_image(name, size=None):
+    """Варианты для srcset (если известны размеры) и миниатюры.
+
+    Ленты, закешированные до их появления, показывают исходник без
+    srcset: новая версия лент сбрасывает и фрагменты, и ETag.
+    """
+    if size:
+        save_variants(name, size)
+    generate_thumbnails(name)
+    bump_feed_versions('index', 'follow')
+
+
+def generate_in_thread(name, size=None):
+    try:
+        prepare_image(name, size)
+    finally:
+        # у каждого потока своё соединение с базой
+        connections.close_all()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def submit_thumbnails(name, size=None):
+    if settings.THUMBNAIL_WORKERS:
+        get_executor().submit(generate_in_thread, name, size)
+    else:
+        prepare_image(name, size)
+
+
+def schedule_thumbnails(image, size=None):
+    """Ставит миниатюры картинки в очередь после коммита транзакции.
+
+    size — размеры картинки, принятой через posts.images: тогда в той
+    же задаче готовятся и варианты для srcset.
+    """
+    if image:
+        name = image.name
+        transaction.on_commit(lambda: submit_thumbnails(name, size))
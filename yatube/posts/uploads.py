@@ -0,0 +1,41 @@
+from io import BytesIO
+
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+
+from yatube.constants import IMAGE_MAX_UPLOAD_SIZE
+
+
+class OversizedUpload(UploadedFile):
+    """Пустая заглушка вместо файла больше IMAGE_MAX_UPLOAD_SIZE."""
+
+    def __init__(self, name, content_type, size, charset, extra):
+        super().__init__(BytesIO(), name, content_type, size, charset, extra)
+
+
+class LimitedUploadHandler(FileUploadHandler):
+    """Первый обработчик загрузок: режет поток после предела.
+
+    До предела части файла идут дальше по цепочке (в память или во
+    временный файл на диске), после — отбрасываются. Вместо файла
+    форма получает OversizedUpload с настоящим размером и сообщает
+    об ошибке, не разбирая картинку.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > IMAGE_MAX_UPLOAD_SIZE:
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.received <= IMAGE_MAX_UPLOAD_SIZE:
+            return None
+        return OversizedUpload(
+            self.file_name, self.content_type, self.received,
+            self.charset, self.content_type_extra,
+        )
@@ -1,7 +1,258 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
 
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
 
-def create_page_object(request, posts, count):
-    paginator = Paginator(posts, count)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+from yatube.constants import COMMENTS_PER_PAGE, FEED_CACHE_TIMEOUT
+
+# Поля, по которым упорядочены ленты: дата публикации и id
+# как уникальный «разрыватель» одинаковых дат.
+CURSOR_KEYS = ('pub_date', 'pk')
+# Комментарии идут от старых к новым по (created, id).
+COMMENT_CURSOR_KEYS = ('created', 'pk')
+
+
+def encode_cursor(obj, keys=CURSOR_KEYS):
+    """Упаковывает ключ объекта в непрозрачный токен для ?after=/?before=."""
+    # строки из values() — словари, объекты моделей — атрибуты
+    if isinstance(obj, dict):
+        pub_date, pk = (obj[key] for key in keys)
+    else:
+        pub_date, pk = (getattr(obj, key) for key in keys)
+    raw = f'{pub_date.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (pub_date, pk) из токена или None, если токен битый."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        pub_date, pk = raw.decode().split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+class CursorPage(Page):
+    """Страница ленты, выбранная по курсору без COUNT и OFFSET.
+
+    Номер страницы неизвестен, поэтому шаблон переходит
+    по ней только ссылками next_cursor/previous_cursor.
+    """
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def next_page_number(self):
+        return None
+
+    def previous_page_number(self):
+        return None
+
+
+class WindowedPage(Page):
+    """Страница с ограниченным окном ссылок на соседние страницы."""
+    on_each_side = 2
+    on_ends = 1
+
+    @property
+    def page_window(self):
+        """Номера страниц вокруг текущей; None — пропуск «…».
+
+        Например, для 50-й страницы из 100: 1, None, 48…52, None, 100.
+        """
+        num_pages = self.paginator.num_pages
+        first = max(self.number - self.on_each_side, 1)
+        last = min(self.number + self.on_each_side, num_pages)
+        window = []
+        if first > self.on_ends + 1:
+            window.extend(range(1, self.on_ends + 1))
+            window.append(None)
+            window_start = first
+        else:
+            window_start = 1
+        window.extend(range(window_start, last + 1))
+        if last < num_pages - self.on_ends:
+            window.append(None)
+            window.extend(range(num_pages - self.on_ends + 1, num_pages + 1))
+        else:
+            window.extend(range(last + 1, num_pages + 1))
+        return window
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, который берёт COUNT(*) из кеша по ключу ленты.
+
+    Ключ содержит версию ленты (posts.caching), поэтому записи
+    сбрасывают закешированное число вместе с фрагментами лент.
+    """
+
+    def __init__(self, object_list, per_page, count_key=None, **kwargs):
+        self.count_key = count_key
+        super().__init__(object_list, per_page, **kwargs)
+
+    @cached_property
+    def count(self):
+        if self.count_key is None:
+            return super().count
+        count = cache.get(self.count_key)
+        if count is None:
+            count = super().count
+            cache.set(self.count_key, count, FEED_CACHE_TIMEOUT)
+        return count
+
+    def _get_page(self, *args, **kwargs):
+        return WindowedPage(*args, **kwargs)
+
+
+class CursorPaginator(Paginator):
+    """Keyset-паджинатор по паре (дата, id).
+
+    По умолчанию — от новых к старым, как ленты; с descending=False —
+    от старых к новым, как комментарии под постом.
+    """
+
+    def __init__(self, object_list, per_page, keys=CURSOR_KEYS,
+                 descending=True):
+        self.keys = keys
+        self.descending = descending
+        sign = '-' if descending else ''
+        super().__init__(
+            object_list.order_by(*(f'{sign}{key}' for key in keys)), per_page
+        )
+
+    def _key_filter(self, cursor, lookup):
+        # (pub_date, id) < (X, Y) записано как
+        # pub_date <= X AND (pub_date < X OR id < Y): первое условие
+        # остаётся диапазоном по индексу, OR проверяется уже на строках.
+        (date_key, pk_key), (pub_date, pk) = self.keys, cursor
+        strict = lookup[:2]
+        return Q(**{f'{date_key}__{strict}e': pub_date}) & (
+            Q(**{f'{date_key}__{strict}': pub_date})
+            | Q(**{f'{pk_key}__{lookup}': pk})
+        )
+
+    def _lookups(self, forward):
+        """Строгое и нестрогое сравнение для шага вперёд или назад."""
+        if forward == self.descending:
+            return 'lt', 'gte'
+        return 'gt', 'lte'
+
+    def first_page(self):
+        rows = list(self.object_list[:self.per_page + 1])
+        return CursorPage(
+            rows[:self.per_page], self,
+            has_next=len(rows) > self.per_page,
+            has_previous=False,
+        )
+
+    def page_after(self, cursor):
+        """Страница записей, идущих в ленте после курсора."""
+        ahead, behind = self._lookups(forward=True)
+        rows = list(
+            self.object_list.filter(self._key_filter(cursor, ahead))
+            [:self.per_page + 1]
+        )
+        has_previous = self.object_list.filter(
+            self._key_filter(cursor, behind)
+        ).exists()
+        return CursorPage(
+            rows[:self.per_page], self,
+            has_next=len(rows) > self.per_page,
+            has_previous=has_previous,
+        )
+
+    def page_before(self, cursor):
+        """Страница записей, идущих в ленте перед курсором."""
+        ahead, behind = self._lookups(forward=False)
+        rows = list(
+            self.object_list.filter(self._key_filter(cursor, ahead))
+            .reverse()[:self.per_page + 1]
+        )
+        has_next = self.object_list.filter(
+            self._key_filter(cursor, behind)
+        ).exists()
+        return CursorPage(
+            rows[:self.per_page][::-1], self,
+            has_next=has_next,
+            has_previous=len(rows) > self.per_page,
+        )
+
+
+def _attach_cursors(page, keys):
+    """Добавляет странице токены соседних страниц по крайним записям."""
+    objects = list(page.object_list)
+    page.object_list = objects
+    page.next_cursor = (
+        encode_cursor(objects[-1], keys)
+        if objects and page.has_next() else None
+    )
+    page.previous_cursor = (
+        encode_cursor(objects[0], keys)
+        if objects and page.has_previous() else None
+    )
+    return page
+
+
+def _page_by_cursor(request, paginator):
+    """Страница по ?after=/?before= или None, если курсора нет."""
+    for param, get_page in (('after', paginator.page_after),
+                            ('before', paginator.page_before)):
+        cursor = decode_cursor(request.GET.get(param, ''))
+        if cursor is not None:
+            return get_page(cursor)
+    return None
+
+
+def cursor_page_object(request, objects, count, keys=CURSOR_KEYS,
+                       descending=True):
+    """Страница только по курсорам: без ?after=/?before= — первая."""
+    paginator = CursorPaginator(objects, count, keys, descending)
+    page = _page_by_cursor(request, paginator)
+    if page is None:
+        page = paginator.first_page()
+    return _attach_cursors(page, keys)
+
+
+def comment_page_object(request, comments):
+    """Страница комментариев по курсору, от старых к новым."""
+    return cursor_page_object(
+        request, comments, COMMENTS_PER_PAGE, COMMENT_CURSOR_KEYS,
+        descending=False,
+    )
+
+
+def create_page_object(request, posts, count, keys=CURSOR_KEYS,
+                       count_key=None):
+    """Страница ленты.
+
+    При ?after=/?before= страница выбирается по курсору,
+    иначе — по номеру ?page=; число постов для номерной страницы
+    берётся из кеша по count_key, если он передан.
+    """
+    paginator = CursorPaginator(posts, count, keys)
+    page = _page_by_cursor(request, paginator)
+    if page is None:
+        page = CachedCountPaginator(
+            paginator.object_list, count, count_key
+        ).get_page(request.GET.get('page'))
+    return _attach_cursors(page, keys)
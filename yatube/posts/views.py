@@ -1,27 +1,46 @@
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
 
 from yatube.constants import POSTS_PER_STR
 
+from .caching import feed_cache_context, feed_count_key
+from .conditional import feed_condition, post_condition
+from .counters import get_posts_count
+from .follows import is_following
 from .forms import PostForm, CommentForm
-from .models import Group, Post, User, Follow
-from .utils import create_page_object
+from .lookups import get_author_or_404, get_group_or_404
+from .models import Post, Follow
+from .search import search_page
+from .utils import comment_page_object, create_page_object
 
 
+@feed_condition('index')
 def index(request):
-    post_list = Post.objects.all()
-    page_obj = create_page_object(request, post_list, POSTS_PER_STR)
+    post_list = Post.objects.select_related('author', 'group')
+    page_obj = create_page_object(
+        request, post_list, POSTS_PER_STR,
+        count_key=feed_count_key('index', 'index'),
+    )
 
     context = {
         'page_obj': page_obj,
+        **feed_cache_context(
+            request, 'index',
+            'auth' if request.user.is_authenticated else 'anon'
+        ),
     }
     return render(request, 'posts/index.html', context)
 
 
+@feed_condition('index')
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.group_posts.select_related('group')
-    page_obj = create_page_object(request, posts, POSTS_PER_STR)
+    group = get_group_or_404(slug)
+    posts = group.group_posts.select_related('author', 'group')
+    page_obj = create_page_object(
+        request, posts, POSTS_PER_STR,
+        count_key=feed_count_key('index', f'group:{group.pk}'),
+    )
 
     context = {
         'group': group,
@@ -30,14 +49,16 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@feed_condition('index', 'follow')
 def profile(request, username):
-    user = get_object_or_404(User, username=username)
-    posts = user.posts.select_related('author')
-    posts_count = Post.objects.filter(author__exact=user).count
-    page_obj = create_page_object(request, posts, POSTS_PER_STR)
-    following = True
-    # if request.user.is_authenticated  and user != request.user:
-    #     following = Follow.objects.filter(user=request.user).exists()
+    user = get_author_or_404(username)
+    posts = user.posts.select_related('author', 'group')
+    posts_count = get_posts_count(user)
+    page_obj = create_page_object(
+        request, posts, POSTS_PER_STR,
+        count_key=feed_count_key('index', f'profile:{user.pk}'),
+    )
+    following = is_following(request, user)
 
     context = {
         "username": username,
@@ -49,20 +70,64 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+@post_condition
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    posts_count = Post.objects.filter(author__exact=post.author).count
+    post = get_object_or_404(
+        Post.objects.select_related('author__post_counter', 'group'),
+        pk=post_id
+    )
+    posts_count = get_posts_count(post.author)
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
     context = {
         "post": post,
         "posts_count": posts_count,
         'form': form,
-        'comments': comments,
+        'comments': comment_page_object(
+            request, post.comments.select_related('author')
+        ),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@post_condition
+def post_comments(request, post_id):
+    """Следующая страница комментариев фрагментом для подгрузки."""
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {
+        'post': post,
+        'comments': comment_page_object(
+            request, post.comments.select_related('author')
+        ),
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    group = author = None
+    if request.GET.get('group'):
+        group = get_group_or_404(request.GET['group'])
+    if request.GET.get('author'):
+        author = get_author_or_404(request.GET['author'])
+    page_obj = None
+    if query:
+        page_obj = search_page(
+            query, POSTS_PER_STR, group=group, author=author,
+            after=request.GET.get('after'), before=request.GET.get('before'),
+        )
+    params = request.GET.copy()
+    for param in ('after', 'before', 'page'):
+        params.pop(param, None)
+    context = {
+        'query': query,
+        'group': group,
+        'author': author,
+        'page_obj': page_obj,
+        'page_params': params.urlencode() + '&' if params else '',
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST, files=request.FILES or None)
@@ -80,18 +145,21 @@ def post_create(request):
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
+    if post.author != request.user:
+        return redirect('posts:post_detail', post.id)
     form = PostForm(
         request.POST or None,
         files=request.FILES or None,
         instance=post
     )
-    # form = PostForm(request.POST or None, instance=post)
-    if post.author != request.user:
-        return redirect('posts:post_detail', post.id)
     if form.is_valid():
-        post = form.save()
-        form.instance.author = request.user
-        post.save()
+        # одна запись и только изменённых полей; по update_fields
+        # сигналы решают, какие кеши и миниатюры затронуты
+        if form.changed_data:
+            with transaction.atomic():
+                form.save(commit=False).save(
+                    update_fields=[*form.changed_data, 'updated']
+                )
         return redirect('posts:post_detail', post_id)
     context = {
         'form': form,
@@ -109,17 +177,27 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        # комментарий и счётчик поста — одной транзакцией
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@feed_condition('follow')
 def follow_index(request):
-    # информация о текущем пользователе доступна в переменной request.user
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = create_page_object(request, posts, POSTS_PER_STR)
+    # лента читателя заранее собрана в FeedItem, см. posts/feed.py
+    feed = request.user.feed_items.select_related(
+        'post__author', 'post__group'
+    )
+    page_obj = create_page_object(
+        request, feed, POSTS_PER_STR, keys=('pub_date', 'post_id'),
+        count_key=feed_count_key('follow', f'follow:{request.user.pk}'),
+    )
+    page_obj.object_list = [item.post for item in page_obj]
     context = {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        **feed_cache_context(request, 'follow', request.user.pk),
     }
     return render(request, 'posts/follow.html', context)
 
@@ -127,20 +205,16 @@ def follow_index(request):
 @login_required
 def profile_follow(request, username):
     # Подписаться на автора
-    author = get_object_or_404(User, username=username)
-    follow = Follow.objects.filter(
-        user=request.user,
-        author=author)
-    if request.user != author and not follow.exists():
-        Follow.objects.create(user=request.user,
-                              author=author)
+    author = get_author_or_404(username)
+    if request.user != author and not is_following(request, author):
+        Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
     # Дизлайк, отписка
-    author = User.objects.get(username=username)
+    author = get_author_or_404(username)
     Follow.objects.filter(
         user=request.user,
         author=author,
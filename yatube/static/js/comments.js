@@ -0,0 +1,13 @@
+// Подгружает следующую страницу комментариев фрагментом,
+// не перерисовывая страницу поста.
+document.addEventListener('click', function (event) {
+  var link = event.target.closest('.js-more-comments');
+  if (!link) {
+    return;
+  }
+  event.preventDefault();
+  fetch(link.dataset.fragment, {credentials: 'same-origin'})
+    .then(function (response) { return response.text(); })
+    .then(function (html) { link.outerHTML = html; })
+    .catch(function () { window.location = link.href; });
+});
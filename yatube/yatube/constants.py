@@ -1 +1,17 @@
 POSTS_PER_STR: int = 10
+# Фрагменты лент сбрасываются версией при записи, поэтому TTL большой.
+FEED_CACHE_TIMEOUT: int = 60 * 60 * 6
+# Размеры миниатюр, которые готовятся заранее после сохранения поста.
+THUMBNAIL_GEOMETRIES: dict = {
+    '960x339': {'crop': 'center', 'upscale': True},
+}
+COMMENTS_PER_PAGE: int = 20
+# Загрузка картинок: предел размера файла и числа пикселей исходника,
+# наибольшая сторона после перекодирования и ширины вариантов для srcset.
+IMAGE_MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024
+IMAGE_MAX_PIXELS: int = 40_000_000
+IMAGE_MAX_SIDE: int = 1920
+IMAGE_QUALITY: int = 82
+IMAGE_VARIANT_WIDTHS: tuple = (320, 640, 960)
+# Длина отрывка текста поста в лентах, символов.
+POST_EXCERPT_LENGTH: int = 300
@@ -31,6 +31,7 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -44,18 +45,32 @@ ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
+# Кешировать разобранные шаблоны в памяти процесса. В разработке
+# выключено, чтобы правки шаблонов были видны без перезапуска.
+TEMPLATE_CACHE = not DEBUG
+# При старте WSGI-процесса разобрать все шаблоны заранее (core.warmup).
+TEMPLATE_WARMUP = TEMPLATE_CACHE
+
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)
+            ] if TEMPLATE_CACHE else TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'posts.context_processors.following',
             ],
         },
     },
@@ -70,6 +85,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # тестовая база в файле, а не в памяти: в общей in-memory базе
+        # параллельные соединения сразу получают «table is locked»,
+        # а файловая ждёт блокировку, как рабочая
+        'TEST': {
+            'NAME': os.path.join(BASE_DIR, 'test_db.sqlite3'),
+        },
     }
 }
 
@@ -122,8 +143,59 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Локальный LRU процесса перед общим кешем (core.cache.TwoTierCache).
+# В разработке общий уровень — LocMemCache; в бою 'shared' указывает
+# на memcached или redis, а 'default' остаётся как есть.
 CACHES = {
     'default': {
+        'BACKEND': 'core.cache.TwoTierCache',
+        'LOCATION': 'two-tier',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 5,
+            'SYNC_INTERVAL': 1,
+        },
+    },
+    'shared': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'LOCATION': 'shared',
+    },
+}
+
+# Загрузка больше IMAGE_MAX_UPLOAD_SIZE обрывается первым обработчиком;
+# всё, что больше FILE_UPLOAD_MAX_MEMORY_SIZE, пишется во временный файл.
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploads.LimitedUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+FILE_UPLOAD_MAX_MEMORY_SIZE = 1024 * 1024
+
+# Потоки для фоновой подготовки миниатюр; 0 — готовить сразу в процессе.
+THUMBNAIL_WORKERS = 2
+
+# Заголовок Server-Timing с метриками запроса (core.middleware).
+PERFORMANCE_INSTRUMENTATION = DEBUG
+# Дублировать метрики строкой JSON в лог yatube.performance.
+PERFORMANCE_LOG = False
+
+# Метрики запросов (PERFORMANCE_LOG) и отчёт о старте процесса
+# (core.warmup) пишутся в yatube.performance на уровне INFO; без
+# своего обработчика logging отбрасывает всё ниже WARNING.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'performance': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'yatube.performance': {
+            'handlers': ['performance'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
 }
@@ -1,7 +1,13 @@
 import os
+from time import perf_counter
 
 from django.core.wsgi import get_wsgi_application
 
+from core.warmup import warm_on_start
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
+started = perf_counter()
 application = get_wsgi_application()
+# шаблоны разбираются до первого запроса, а не на нём
+warm_on_start(started)